@@ -10,3 +10,9 @@ class Roles(DjangoChoices):
 class Genres(DjangoChoices):
     Female = ChoiceItem(1, 'Femenino')
     Male = ChoiceItem(2, 'Masculino')
+
+
+class MovementTypes(DjangoChoices):
+    Income = ChoiceItem('ingreso', 'Ingreso')
+    Expense = ChoiceItem('egreso', 'Egreso')
+    Transfer = ChoiceItem('transferencia', 'Transferencia')
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db.migrations.operations.base import Operation
+
+
+class AddActiveIndex(Operation):
+    """
+    Migration operation that creates an index for queries filtering is_active=True: a composite index with is_active
+    in the given position, so the equality on it is matched whether is_active comes as a literal or, like the ORM sends
+    it, as a bound parameter. A partial index WHERE is_active is not used for a bound parameter by every SQLite build.
+    The index is not part of the model state, so the autodetector ignores it, and applying it again when the index
+    exists does nothing.
+    """
+
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name, name, fields, replace=False):
+        """
+        :param model_name: model name
+        :param name: index name
+        :param fields: field names in index order, including is_active
+        :param replace: drop an index with the same name first, e.g. one with other columns; unapplying it keeps the
+                        new index
+        """
+        self.model_name = model_name
+        self.name = name
+        self.fields = fields
+        self.replace = replace
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'name': self.name, 'fields': self.fields}
+        if self.replace:
+            kwargs['replace'] = True
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _drop(self, schema_editor, model):
+        schema_editor.execute(schema_editor.sql_delete_index % {
+            'table': schema_editor.quote_name(model._meta.db_table),
+            'name': schema_editor.quote_name(self.name),
+        })
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if index_exists(schema_editor.connection, model._meta.db_table, self.name):
+            if not self.replace:
+                return
+            self._drop(schema_editor, model)
+
+        quote = schema_editor.quote_name
+        columns = [quote(model._meta.get_field(field).column) for field in self.fields]
+        schema_editor.execute('CREATE INDEX %s ON %s (%s)' % (
+            quote(self.name), quote(model._meta.db_table), ', '.join(columns)
+        ))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model) or self.replace:
+            return
+
+        self._drop(schema_editor, model)
+
+    def describe(self):
+        action = 'Replace' if self.replace else 'Create'
+        return '%s index %s on active rows of %s' % (action, self.name, self.model_name)
+
+
+class AddFullTextIndex(Operation):
+    """
+    Migration operation that indexes the words of a text column. On SQLite it is an external content FTS5 table named
+    like the index, kept in sync with the rows by triggers, that can also index the value of a scope column so a
+    search inside one scope (e.g. a user) only reads the rows of that scope; on MySQL it is a FULLTEXT index. Other
+    backends, and
+    SQLite builds without FTS5, get no index and the searches fall back to LIKE. The index is not part of the model
+    state, so the autodetector ignores it. Applying it again only restores the triggers, which SQLite drops when a
+    migration rebuilds the table, see KeepIndexes.
+    """
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, model_name, name, field, scope=None):
+        """
+        :param model_name: model name
+        :param name: index name, also the name of the FTS5 table
+        :param field: name of the text field
+        :param scope: name of the field indexed next to the text in the FTS5 table (optional)
+        """
+        self.model_name = model_name
+        self.name = name
+        self.field = field
+        self.scope = scope
+
+    def deconstruct(self):
+        kwargs = {'model_name': self.model_name, 'name': self.name, 'field': self.field}
+        if self.scope:
+            kwargs['scope'] = self.scope
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        column = quote(model._meta.get_field(self.field).column)
+        pk = quote(model._meta.pk.column)
+        vendor = schema_editor.connection.vendor
+
+        if vendor == 'mysql':
+            if not index_exists(schema_editor.connection, model._meta.db_table, self.name):
+                schema_editor.execute('CREATE FULLTEXT INDEX %s ON %s (%s)' % (quote(self.name), table, column))
+        elif vendor == 'sqlite' and fts5_available(schema_editor.connection):
+            fts = quote(self.name)
+            columns = [column]
+            if self.scope:
+                columns.append(quote(model._meta.get_field(self.scope).column))
+            exists = self.name in schema_editor.connection.introspection.table_names()
+
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(%s, content=%s, content_rowid=%s, "
+                "tokenize='unicode61 remove_diacritics 2')" % (
+                    fts, ', '.join(columns), schema_editor.quote_value(model._meta.db_table),
+                    schema_editor.quote_value(model._meta.pk.column)
+                )
+            )
+            values = {
+                'fts': fts, 'table': table, 'pk': pk, 'columns': ', '.join(columns),
+                'new': ', '.join('new.%s' % name for name in columns),
+                'old': ', '.join('old.%s' % name for name in columns),
+            }
+            values.update({suffix: quote('%s_%s' % (self.name, suffix)) for suffix in ('insert', 'delete', 'update')})
+            schema_editor.execute(
+                'CREATE TRIGGER IF NOT EXISTS %(insert)s AFTER INSERT ON %(table)s BEGIN '
+                'INSERT INTO %(fts)s (rowid, %(columns)s) VALUES (new.%(pk)s, %(new)s); END' % values
+            )
+            schema_editor.execute(
+                'CREATE TRIGGER IF NOT EXISTS %(delete)s AFTER DELETE ON %(table)s BEGIN '
+                "INSERT INTO %(fts)s (%(fts)s, rowid, %(columns)s) VALUES ('delete', old.%(pk)s, %(old)s); "
+                'END' % values
+            )
+            schema_editor.execute(
+                'CREATE TRIGGER IF NOT EXISTS %(update)s AFTER UPDATE OF %(columns)s ON %(table)s BEGIN '
+                "INSERT INTO %(fts)s (%(fts)s, rowid, %(columns)s) VALUES ('delete', old.%(pk)s, %(old)s); "
+                'INSERT INTO %(fts)s (rowid, %(columns)s) VALUES (new.%(pk)s, %(new)s); END' % values
+            )
+            if not exists:
+                # Index the rows that already exist
+                schema_editor.execute("INSERT INTO %s (%s) VALUES ('rebuild')" % (fts, fts))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+
+        vendor = schema_editor.connection.vendor
+
+        if vendor == 'mysql':
+            schema_editor.execute(schema_editor.sql_delete_index % {
+                'table': schema_editor.quote_name(model._meta.db_table),
+                'name': schema_editor.quote_name(self.name),
+            })
+        elif vendor == 'sqlite':
+            for suffix in ('insert', 'delete', 'update'):
+                trigger = schema_editor.quote_name('%s_%s' % (self.name, suffix))
+                schema_editor.execute('DROP TRIGGER IF EXISTS %s' % trigger)
+            schema_editor.execute('DROP TABLE IF EXISTS %s' % schema_editor.quote_name(self.name))
+
+    def describe(self):
+        return 'Create full text index %s on %s.%s' % (self.name, self.model_name, self.field)
+
+
+def fts5_available(connection):
+    """
+    This function tell if the SQLite library of a connection was built with the FTS5 extension
+    :param connection: sqlite database connection
+    :return: bool
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def index_exists(connection, table, name):
+    """
+    This function tell if a table has an index
+    :param connection: database connection
+    :param table: table name
+    :param name: index name
+    :return: bool
+    """
+    with connection.cursor() as cursor:
+        return name in connection.introspection.get_constraints(cursor, table)
+
+
+class KeepIndexes(Operation):
+    """
+    Migration operation that runs some operations and then applies again the index operations given, in both
+    directions. SQLite rebuilds the whole table to add or alter a column, and the rebuilt table only has the indexes
+    of the model state, so the AddActiveIndex and AddFullTextIndex of the table must wrap those changes.
+    """
+
+    reduces_to_sql = False
+    reversible = True
+
+    def __init__(self, operations, indexes):
+        """
+        :param operations: operations that may rebuild the tables
+        :param indexes: AddActiveIndex and AddFullTextIndex to apply again
+        """
+        self.operations = operations
+        self.indexes = indexes
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'operations': self.operations, 'indexes': self.indexes}
+
+    def state_forwards(self, app_label, state):
+        for operation in self.operations:
+            operation.state_forwards(app_label, state)
+
+    def _states(self, app_label, state):
+        states = [state]
+        for operation in self.operations:
+            state = state.clone()
+            operation.state_forwards(app_label, state)
+            states.append(state)
+        return states
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        states = self._states(app_label, from_state)
+        for operation, before, after in zip(self.operations, states, states[1:]):
+            operation.database_forwards(app_label, schema_editor, before, after)
+
+        for index in self.indexes:
+            index.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        states = self._states(app_label, to_state)
+        for operation, before, after in reversed(list(zip(self.operations, states, states[1:]))):
+            operation.database_backwards(app_label, schema_editor, after, before)
+
+        for index in self.indexes:
+            index.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return '%s; keeping %s' % ('; '.join(operation.describe() for operation in self.operations),
+                                   ', '.join(index.name for index in self.indexes))
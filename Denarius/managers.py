@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import UserManager
+from django.db import models
+
+
+class ActiveManagerMixin(object):
+    """
+    Manager mixin that leaves out the soft deleted rows, the ones with is_active=False. The models keep a plain
+    all_objects manager as their default manager, so the admin, dumpdata and the related objects still see every row.
+    """
+
+    def get_queryset(self):
+        return super(ActiveManagerMixin, self).get_queryset().filter(is_active=True)
+
+
+class ActiveManager(ActiveManagerMixin, models.Manager):
+    pass
+
+
+class ActiveUserManager(ActiveManagerMixin, UserManager):
+    use_in_migrations = False
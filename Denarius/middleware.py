@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import logging
+import random
+import threading
+import time
+import timeit
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.backends.utils import CursorWrapper
+from django.utils.deprecation import MiddlewareMixin
+
+from Denarius.routers import read_from_replicas
+
+logger = logging.getLogger('denarius.performance')
+
+
+class TimedCursorWrapper(CursorWrapper):
+    """
+    Cursor wrapper that adds the queries it runs and their duration to the totals of the request being measured
+    """
+
+    def __init__(self, cursor, db, totals):
+        super(TimedCursorWrapper, self).__init__(cursor, db)
+        self.totals = totals
+
+    def _timed(self, method, *args):
+        start = timeit.default_timer()
+        try:
+            return method(*args)
+        finally:
+            self.totals[0] += 1
+            self.totals[1] += timeit.default_timer() - start
+
+    def execute(self, sql, params=None):
+        return self._timed(super(TimedCursorWrapper, self).execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._timed(super(TimedCursorWrapper, self).executemany, sql, param_list)
+
+
+def _timed_cursors(connection, make_cursor, totals):
+    def timed(cursor):
+        return TimedCursorWrapper(make_cursor(cursor), connection, totals)
+    return timed
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    """
+    Middleware that measures every API request: time spent in the view and rendering the response and, when enabled,
+    number of SQL queries and time spent in the database. The measures are sent in the Server-Timing header and logged
+    as a JSON line for the slow requests and a sample of the rest.
+
+    Settings:
+        PERFORMANCE_PATH_PREFIX: only requests under this path are measured, '/api/' by default
+        PERFORMANCE_QUERY_TIMING: also count and time the queries, False by default, so out of the box there is no
+                                  db metric. The cursors of the request are wrapped to time each query, which costs
+                                  a little on every query
+        PERFORMANCE_SLOW_REQUEST_MS: requests slower than this are always logged as warnings, 500 by default
+        PERFORMANCE_LOG_SAMPLE_RATE: fraction of the other requests that are logged, 0 by default
+    """
+
+    def process_request(self, request):
+        if not request.path.startswith(getattr(settings, 'PERFORMANCE_PATH_PREFIX', '/api/')):
+            return
+
+        request._server_timing = {'start': timeit.default_timer()}
+
+        if getattr(settings, 'PERFORMANCE_QUERY_TIMING', False):
+            totals = request._server_timing['queries'] = [0, 0.0]
+            request._server_timing['connections'] = connections.all()
+            # Only the connections of this thread, and only until the response; the debug cursor of DEBUG and of
+            # the tests is wrapped too so it keeps recording
+            for connection in request._server_timing['connections']:
+                connection.make_cursor = _timed_cursors(connection, connection.make_cursor, totals)
+                connection.make_debug_cursor = _timed_cursors(connection, connection.make_debug_cursor, totals)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, '_server_timing', None)
+        if timing is not None:
+            timing['view'] = timeit.default_timer()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and before the response is rendered
+        timing = getattr(request, '_server_timing', None)
+        if timing is not None:
+            timing['render'] = timeit.default_timer()
+        return response
+
+    def process_response(self, request, response):
+        timing = getattr(request, '_server_timing', None)
+        if timing is None:
+            return response
+
+        end = timeit.default_timer()
+        view_start = timing.get('view', timing['start'])
+        render_start = timing.get('render', end)
+        measures = {
+            'view_ms': round((render_start - view_start) * 1000, 3),
+            'render_ms': round((end - render_start) * 1000, 3),
+            'total_ms': round((end - timing['start']) * 1000, 3),
+        }
+        metrics = []
+
+        if 'queries' in timing:
+            for connection in timing['connections']:
+                del connection.make_cursor
+                del connection.make_debug_cursor
+
+            queries, db_time = timing['queries']
+            measures.update(queries=queries, db_ms=round(db_time * 1000, 3))
+            metrics.append('db;dur=%s;desc="%d queries"' % (measures['db_ms'], queries))
+
+        response['Server-Timing'] = ', '.join(metrics + [
+            'view;dur=%s' % measures['view_ms'],
+            'render;dur=%s' % measures['render_ms'],
+            'total;dur=%s' % measures['total_ms'],
+        ])
+
+        self.log(request, response, measures)
+
+        return response
+
+    def log(self, request, response, measures):
+        slow = measures['total_ms'] >= getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 500)
+        if not slow and random.random() >= getattr(settings, 'PERFORMANCE_LOG_SAMPLE_RATE', 0):
+            return
+
+        line = json.dumps(dict(measures, method=request.method, path=request.path, status=response.status_code,
+                               slow=slow), sort_keys=True)
+        logger.log(logging.WARNING if slow else logging.INFO, line)
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Middleware that sends the reads of the GET, HEAD and OPTIONS requests to the read replicas and keeps the rest on
+    the primary. A client that writes gets a cookie that keeps its reads on the primary for a while, so it reads its
+    own writes even when the replicas lag.
+
+    Settings:
+        DATABASE_REPLICAS: aliases of the read replicas, the reads stay on the primary when it is empty
+        REPLICA_STICKY_SECONDS: seconds that the reads of a client stay on the primary after a write, 5 by default
+        REPLICA_STICKY_COOKIE: name of the cookie, 'denarius_primary' by default
+    """
+
+    def __init__(self, get_response=None):
+        super(ReplicaRoutingMiddleware, self).__init__(get_response)
+        self.cookie = getattr(settings, 'REPLICA_STICKY_COOKIE', 'denarius_primary')
+
+    def process_request(self, request):
+        try:
+            sticky = float(request.COOKIES[self.cookie]) > time.time()
+        except (KeyError, ValueError):
+            sticky = False
+
+        read_from_replicas(request.method in ('GET', 'HEAD', 'OPTIONS') and not sticky)
+
+    def process_response(self, request, response):
+        seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and seconds:
+            # The cookie holds when the stickiness ends, for clients that do not honour max_age
+            response.set_cookie(self.cookie, '%.3f' % (time.time() + seconds), max_age=seconds, httponly=True)
+
+        return response
+
+
+_connection_lock = threading.Lock()
+_connection_stats = {'opened': 0, 'reused': 0, 'closed': 0, 'dropped': 0, 'timed': 0, 'setup_seconds': 0.0}
+# Aliases of the connections left open by the last request of each thread, with the time the request ended
+_released = threading.local()
+
+
+def _count_connection(name):
+    with _connection_lock:
+        _connection_stats[name] += 1
+
+
+def connection_stats():
+    """
+    This function return the database connection counters of this process: connections opened and the average time
+    to open them, reused by a request, closed by CONN_MAX_AGE or errors, and dropped by the health check
+    :return: {opened, reused, closed, dropped, average_setup_ms}
+    """
+    with _connection_lock:
+        stats = dict(_connection_stats)
+
+    setup, timed = stats.pop('setup_seconds'), stats.pop('timed')
+    stats['average_setup_ms'] = round(setup * 1000 / timed, 3) if timed else None
+    return stats
+
+
+def _connection_created(sender, connection, **kwargs):
+    # connect() sets close_at from the time it starts, before the handshake with the server
+    max_age = connection.settings_dict['CONN_MAX_AGE']
+    with _connection_lock:
+        _connection_stats['opened'] += 1
+        if max_age is not None and connection.close_at is not None:
+            _connection_stats['timed'] += 1
+            _connection_stats['setup_seconds'] += max(time.time() - (connection.close_at - max_age), 0)
+
+
+connection_created.connect(_connection_created, dispatch_uid='denarius.middleware.connection_created')
+
+
+class ConnectionStatsMiddleware(MiddlewareMixin):
+    """
+    Middleware that checks the persistent connections that a request is going to reuse and counts how the connections
+    are opened, reused, closed and dropped, see connection_stats. With CONN_MAX_AGE the connections stay open between
+    the requests of a thread; Django only tests them after an error, so a connection that the server closed while idle
+    fails on the first query of the next request. The health check pings a connection that was idle for a while
+    before the view runs and opens a new one when it does not answer; a connection used moments ago is not pinged.
+
+    Settings:
+        CONN_HEALTH_CHECKS: ping the reused connections, True by default
+        CONN_HEALTH_CHECK_IDLE_SECONDS: only ping the connections idle for at least these seconds, 30 by default
+    """
+
+    def process_request(self, request):
+        health_checks = getattr(settings, 'CONN_HEALTH_CHECKS', True)
+        idle_seconds = getattr(settings, 'CONN_HEALTH_CHECK_IDLE_SECONDS', 30)
+        released = getattr(_released, 'aliases', {})
+        now = time.time()
+
+        for connection in connections.all():
+            if connection.connection is None:
+                if connection.alias in released:
+                    _count_connection('closed')
+            elif health_checks and now - released.get(connection.alias, now) >= idle_seconds \
+                    and not connection.is_usable():
+                connection.close()
+                _count_connection('dropped')
+            else:
+                _count_connection('reused')
+
+    def process_response(self, request, response):
+        now = time.time()
+        _released.aliases = {
+            connection.alias: now for connection in connections.all() if connection.connection is not None
+        }
+        return response
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def read_from_replicas(enabled):
+    """
+    This function choose where the reads of the current thread go: to the replicas in DATABASE_REPLICAS or to the
+    primary. ReplicaRoutingMiddleware sets it for every request; outside requests reads go to the primary.
+    :param enabled: bool
+    """
+    _state.replicas = enabled
+
+
+def reading_from_replicas():
+    """
+    This function tell if the reads of the current thread are sent to the replicas
+    :return: bool
+    """
+    return getattr(_state, 'replicas', False) and bool(getattr(settings, 'DATABASE_REPLICAS', None))
+
+
+def _reset(**kwargs):
+    # Streaming responses are read after the middleware returns, the request ends when the response is closed
+    read_from_replicas(False)
+
+
+request_finished.connect(_reset, dispatch_uid='denarius.routers.reset')
+
+
+class PrimaryReplicaRouter(object):
+    """
+    Database router that sends every write to the default alias (the primary) and the reads of the requests marked
+    by ReplicaRoutingMiddleware to one of the aliases in DATABASE_REPLICAS
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related rows are read from the same database as the row that points to them
+            return instance._state.db
+
+        if reading_from_replicas():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -46,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Denarius.middleware.ServerTimingMiddleware',
+    'Denarius.middleware.ReplicaRoutingMiddleware',
+    'Denarius.middleware.ConnectionStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,9 +91,30 @@ DATABASES = {
         'USER': 'root',
         'PASSWORD': 'admin123',
         'ATOMIC_REQUESTS': True,
+        # Seconds that a connection is kept open for the next requests of the same worker thread, 0 closes it at the
+        # end of every request
+        'CONN_MAX_AGE': int(os.environ.get('DENARIUS_CONN_MAX_AGE', 60)),
     }
 }
 
+# Ping the persistent connections before a request reuses them, see Denarius.middleware.ConnectionStatsMiddleware
+CONN_HEALTH_CHECKS = True
+
+# Only the connections idle for at least these seconds are pinged, the ones used moments ago are trusted
+CONN_HEALTH_CHECK_IDLE_SECONDS = 30
+
+# Read replicas: add an alias per replica to DATABASES, without ATOMIC_REQUESTS and with 'TEST': {'MIRROR': 'default'},
+# and list it here. The GET requests read from them, see Denarius.middleware.ReplicaRoutingMiddleware
+DATABASE_ROUTERS = ['Denarius.routers.PrimaryReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+# Seconds that the reads of a client stay on the primary after it writes
+REPLICA_STICKY_SECONDS = 5
+
+# The GET endpoints run outside of the ATOMIC_REQUESTS transaction, see api.transactions.read_only
+ATOMIC_READ_REQUESTS = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -110,6 +134,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds that a cached view_user_categories / view_user_accounts response is kept
+USER_CACHE_TIMEOUT = 300
+
 AUTH_USER_MODEL = 'users.User'
 
 CORS_ALLOW_CREDENTIALS = True
@@ -133,3 +169,65 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/1.11/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# API renderers: json by default, the columnar format of api.renderers with Accept or ?format=columns
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarRenderer',
+    ),
+}
+
+
+# API pagination
+
+API_PAGE_SIZE = 100
+
+API_MAX_PAGE_SIZE = 1000
+
+API_STREAM_CHUNK_SIZE = 2000
+
+# Movements accepted by register_movements and rows per INSERT statement
+API_MAX_BULK_MOVEMENTS = 1000
+
+API_BULK_INSERT_SIZE = 500
+
+# Ids accepted by the views that return many rows by id, e.g. view_many_movements
+API_MAX_IDS = 100
+
+# innodb_ft_min_token_size of MySQL: shorter search words are not in the FULLTEXT index, see accounts.search
+SEARCH_MIN_WORD_LENGTH = 3
+
+
+# Performance instrumentation, see Denarius.middleware.ServerTimingMiddleware
+
+PERFORMANCE_PATH_PREFIX = '/api/'
+
+# Opt-in: count and time the SQL queries of every measured request too, it adds a little to every query. While it
+# is off, the Server-Timing header and the performance log have no db entry, queries or db_ms
+PERFORMANCE_QUERY_TIMING = False
+
+PERFORMANCE_SLOW_REQUEST_MS = 500
+
+# Fraction of the requests faster than PERFORMANCE_SLOW_REQUEST_MS that are logged too
+PERFORMANCE_LOG_SAMPLE_RATE = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'denarius.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
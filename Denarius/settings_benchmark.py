@@ -0,0 +1,20 @@
+"""
+Django settings for running the seed_data and benchmark_api commands against a local SQLite database.
+
+    python manage.py migrate --settings=Denarius.settings_benchmark
+    python manage.py seed_data --users 100 --movements 1000 --settings=Denarius.settings_benchmark
+    python manage.py benchmark_api --output before.json --settings=Denarius.settings_benchmark
+"""
+
+from Denarius.settings import *  # noqa: F401,F403
+from Denarius.settings import BASE_DIR, os
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DENARIUS_BENCHMARK_DB', os.path.join(BASE_DIR, 'benchmark.sqlite3')),
+        'ATOMIC_REQUESTS': True,
+    }
+}
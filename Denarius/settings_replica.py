@@ -0,0 +1,27 @@
+"""
+Django settings for trying the read replica routing locally, with two SQLite databases standing in for the primary
+and a replica. Nothing replicates between them: copy the primary over the replica to simulate the replication.
+
+    python manage.py migrate --settings=Denarius.settings_replica
+    python manage.py migrate --database replica --settings=Denarius.settings_replica
+    python manage.py runserver --settings=Denarius.settings_replica
+    cp primary.sqlite3 replica.sqlite3
+"""
+
+from Denarius.settings import *  # noqa: F401,F403
+from Denarius.settings import BASE_DIR, os
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'primary.sqlite3'),
+        'ATOMIC_REQUESTS': True,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_REPLICAS = ['replica']
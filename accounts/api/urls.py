@@ -6,13 +6,16 @@ from django.conf.urls import url
 from accounts.api.views import view_all_categories, view_user_categories, view_single_category, register_category, \
     update_category, delete_category, view_all_accounts, view_user_accounts, view_single_account, register_account, \
     update_account, delete_account, view_all_movements, view_user_movements, view_single_movement, register_movement, \
-    update_movement, delete_movement
+    update_movement, delete_movement, register_movements, view_movement_summary, \
+    view_balance_series, view_account_balance, search_movements, sync, view_many_categories, view_many_accounts, \
+    view_many_movements
 
 urlpatterns = [
     # Categories
     url(r'^view_all_categories/$', view_all_categories, name='api_view_all_categories'),
     url(r'^view_user_categories/(?P<user_id>\d+)/$', view_user_categories, name='api_view_user_categories'),
     url(r'^view_single_category/(?P<category_id>\d+)/$', view_single_category, name='api_view_single_category'),
+    url(r'^view_many_categories/$', view_many_categories, name='api_view_many_categories'),
     url(r'^register_category/$', register_category, name='api_register_category'),
     url(r'^update_category/$', update_category, name='api_update_category'),
     url(r'^delete_category/$', delete_category, name='api_delete_category'),
@@ -21,7 +24,9 @@ urlpatterns = [
     url(r'^view_all_accounts/$', view_all_accounts, name='api_view_all_accounts'),
     url(r'^view_user_accounts/(?P<user_id>\d+)/$', view_user_accounts, name='api_view_user_accounts'),
     url(r'^view_single_account/(?P<account_id>\d+)/$', view_single_account, name='api_view_single_account'),
+    url(r'^view_many_accounts/$', view_many_accounts, name='api_view_many_accounts'),
     url(r'^register_account/$', register_account, name='api_register_account'),
+    url(r'^view_account_balance/(?P<account_id>\d+)/$', view_account_balance, name='api_view_account_balance'),
     url(r'^update_account/$', update_account, name='api_update_account'),
     url(r'^delete_account/$', delete_account, name='api_delete_account'),
 
@@ -29,7 +34,13 @@ urlpatterns = [
     url(r'^view_all_movements/$', view_all_movements, name='api_view_all_movements'),
     url(r'^view_user_movements/(?P<user_id>\d+)/$', view_user_movements, name='api_view_user_movements'),
     url(r'^view_single_movement/(?P<movement_id>\d+)/$', view_single_movement, name='api_view_single_movement'),
+    url(r'^view_many_movements/$', view_many_movements, name='api_view_many_movements'),
     url(r'^register_movement/$', register_movement, name='api_register_movement'),
     url(r'^update_movement/$', update_movement, name='api_update_movement'),
     url(r'^delete_movement/$', delete_movement, name='api_delete_movement'),
+    url(r'^register_movements/$', register_movements, name='api_register_movements'),
+    url(r'^view_movement_summary/(?P<user_id>\d+)/$', view_movement_summary, name='api_view_movement_summary'),
+    url(r'^view_balance_series/(?P<user_id>\d+)/$', view_balance_series, name='api_view_balance_series'),
+    url(r'^search_movements/(?P<user_id>\d+)/$', search_movements, name='api_search_movements'),
+    url(r'^sync/(?P<user_id>\d+)/$', sync, name='api_sync'),
 ]
@@ -1,69 +1,113 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from collections import OrderedDict
 from datetime import datetime
+from operator import attrgetter
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import six
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from accounts.models import Category, Account, Movement
+from accounts.balances import apply_deltas, apply_movement, movement_deltas, revert_movement, to_account_transfer, \
+    to_amount
+from accounts.cache import cache_user_response, invalidate_user
+from accounts.etags import owner_etag, user_etag
+from accounts.models import Category, Account, Movement, BalanceSnapshot, ArchivedMovement
+from accounts.rollups import add_to_rollups
+from accounts.search import search_concepts, search_words
+from accounts.series import balance_series
+from accounts.snapshots import balance_on, invalidate_snapshots
+from accounts.summaries import GROUPS, PERIODS, movement_summary
+from accounts.sync import changes_since
+from api.fieldsets import attribute, Fieldset
+from api.params import get_ids
+from api.pagination import decode_cursor, encode_cursor, get_page_size, paginate, paginate_union, InvalidCursor
+from api.streaming import get_stream_format, stream_response
+from api.transactions import read_only
 from users.models import User
 
 
 # Section of categories
 
 
+CATEGORY_ADMIN_FIELDS = Fieldset(
+    attribute('id'),
+    ('user', ('user__full_name',), lambda category: category.user.get_full_name()),
+    attribute('name'),
+    attribute('description'),
+    attribute('register_date'),
+    attribute('delete_date'),
+    attribute('is_active'),
+    attribute('category_color'),
+)
+
+CATEGORY_FIELDS = Fieldset(
+    attribute('id'),
+    attribute('name'),
+    attribute('description'),
+    attribute('category_color'),
+)
+
+
+@read_only
 @api_view(['GET'])
 def view_all_categories(request):
     """
-    This function return all categories in the data base
+    This function return a page of all categories in the data base, or all of them as a stream
     :param request: petition method GET
-    :return: {categories: [{id, user, name, description, register_date, delete_date, is_active}]}
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: categories per page (optional)
+    :parameter stream: json or ndjson to stream every category instead of a page (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {categories: [{id, user, name, description, register_date, delete_date, is_active}], next}
     """
-    categories = Category.objects.all().order_by('user')
+    try:
+        keys = CATEGORY_ADMIN_FIELDS.get_keys(request)
+        categories = CATEGORY_ADMIN_FIELDS.select(Category.all_objects, keys, ('id', 'user'))
+        serialize = CATEGORY_ADMIN_FIELDS.serializer(keys)
 
-    response = []
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_response(categories, ('user_id', 'id'), 'categories', serialize, stream_format)
 
-    for category in categories:
-        response.append({
-            'id': category.pk,
-            'user': category.user.get_full_name(),
-            'name': category.name,
-            'description': category.description,
-            'register_date': category.register_date,
-            'delete_date': category.delete_date,
-            'is_active': category.is_active,
-            'category_color': category.category_color
-        })
+        categories, next_cursor = paginate(categories, request, ('user_id', 'id'))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    response = [serialize(category) for category in categories]
 
     if response:
-        return Response({'categories': response}, status=status.HTTP_200_OK)
+        return Response({'categories': response, 'next': next_cursor}, status=status.HTTP_200_OK)
     else:
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@read_only
+@condition(etag_func=user_etag)
 @api_view(['GET'])
+@cache_user_response('categories')
 def view_user_categories(request, user_id):
     """
-    This function return all active categories of a user
+    This function return all active categories of a user, the response is cached until the user changes its categories
     :param request: petition method GET
     :param user_id: id user
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {categories: [{id, name, description}]}
     """
     try:
-        user = User.objects.get(pk=user_id)
-        categories = Category.objects.filter(user=user, is_active=True).order_by('name')
-
-        response = []
+        user = User.all_objects.only('id').get(pk=user_id)
+        keys = CATEGORY_FIELDS.get_keys(request)
+        categories = CATEGORY_FIELDS.select(Category.objects.filter(user=user), keys).order_by('name')
+        serialize = CATEGORY_FIELDS.serializer(keys)
 
-        for category in categories:
-            response.append({
-                'id': category.pk,
-                'name': category.name,
-                'description': category.description,
-                'category_color': category.category_color
-            })
+        response = [serialize(category) for category in categories]
 
         if response:
             return Response({'categories': response}, status=status.HTTP_200_OK)
@@ -71,33 +115,59 @@ def view_user_categories(request, user_id):
             return Response(status=status.HTTP_204_NO_CONTENT)
     except User.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+@read_only
+@condition(etag_func=owner_etag(Category))
 @api_view(['GET'])
 def view_single_category(request, category_id):
     """
     This function return a category
     :param request: petition method GET
     :param category_id: id category
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {category: {id, name, description}}
     """
     try:
-        category = Category.objects.get(pk=category_id)
-
-        if category.is_active:
+        keys = CATEGORY_FIELDS.get_keys(request)
+        category = CATEGORY_FIELDS.select(Category.objects, keys).get(pk=category_id)
 
-            response = {
-                'id': category.pk,
-                'name': category.name,
-                'description': category.description,
-                'category_color': category.category_color
-            }
+        response = CATEGORY_FIELDS.serializer(keys)(category)
 
-            return Response({'category': response}, status=status.HTTP_200_OK)
-        else:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'category': response}, status=status.HTTP_200_OK)
     except Category.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@api_view(['GET'])
+def view_many_categories(request):
+    """
+    This function return many categories with one query, instead of one request per category
+    :param request: petition method GET
+    :parameter ids: comma separated list of at most API_MAX_IDS id categories
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {categories: {id: {id, name, description} or null when the category does not exist or was deleted}}
+    """
+    try:
+        ids = get_ids(request)
+        keys = CATEGORY_FIELDS.get_keys(request)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    categories = CATEGORY_FIELDS.select(Category.objects, keys).in_bulk(ids)
+    serialize = CATEGORY_FIELDS.serializer(keys)
+
+    response = OrderedDict()
+
+    for pk in ids:
+        response[pk] = serialize(categories[pk]) if pk in categories else None
+
+    return Response({'categories': response}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -113,12 +183,13 @@ def register_category(request):
     """
     if request.method == 'POST':
         try:
-            user = User.objects.get(pk=request.data['user_id'])
+            user = User.all_objects.get(pk=request.data['user_id'])
             name = request.data['name']
             description = request.data['description']
             color = request.data['color']
 
-            Category.objects.create(user=user, name=name, description=description, category_color=color)
+            Category.objects.create(user=user, name=name, description=description, category_color=color,
+                                    version=invalidate_user(user.pk))
 
             return Response(status=status.HTTP_200_OK)
         except User.DoesNotExist:
@@ -140,7 +211,7 @@ def update_category(request):
     """
     if request.method == 'POST':
         try:
-            category = Category.objects.get(pk=request.data['category_id'])
+            category = Category.all_objects.get(pk=request.data['category_id'])
             name = request.data['name']
             description = request.data['description']
             color = request.data['color']
@@ -148,6 +219,7 @@ def update_category(request):
             category.name = name
             category.description = description
             category.category_color = color
+            category.version = invalidate_user(category.user_id)
             category.save()
 
             return Response(status=status.HTTP_200_OK)
@@ -168,10 +240,11 @@ def delete_category(request):
     """
     if request.method == 'POST':
         try:
-            category = Category.objects.get(pk=request.data['category_id'])
+            category = Category.all_objects.get(pk=request.data['category_id'])
 
             category.delete_date = datetime.today()
             category.is_active = False
+            category.version = invalidate_user(category.user_id)
 
             category.save()
 
@@ -185,56 +258,78 @@ def delete_category(request):
 # Section of accounts
 
 
+ACCOUNT_ADMIN_FIELDS = Fieldset(
+    attribute('id'),
+    ('user', ('user__full_name',), lambda account: account.user.get_full_name()),
+    attribute('name'),
+    attribute('description'),
+    attribute('money'),
+    attribute('register_date'),
+    attribute('delete_date'),
+    attribute('is_active'),
+)
+
+ACCOUNT_FIELDS = Fieldset(
+    attribute('id'),
+    attribute('name'),
+    attribute('description'),
+    attribute('money'),
+)
+
+
+@read_only
 @api_view(['GET'])
 def view_all_accounts(request):
     """
-    This function return all accounts in the data base
+    This function return a page of all accounts in the data base, or all of them as a stream
     :param request: petition method GET
-    :return: {accounts: [{id, user, name, description, money, register_date, delete_date, is_active}]}
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: accounts per page (optional)
+    :parameter stream: json or ndjson to stream every account instead of a page (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {accounts: [{id, user, name, description, money, register_date, delete_date, is_active}], next}
     """
-    accounts = Account.objects.all().order_by('user')
+    try:
+        keys = ACCOUNT_ADMIN_FIELDS.get_keys(request)
+        accounts = ACCOUNT_ADMIN_FIELDS.select(Account.all_objects, keys, ('id', 'user'))
+        serialize = ACCOUNT_ADMIN_FIELDS.serializer(keys)
+
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_response(accounts, ('user_id', 'id'), 'accounts', serialize, stream_format)
 
-    response = []
+        accounts, next_cursor = paginate(accounts, request, ('user_id', 'id'))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    for account in accounts:
-        response.append({
-            'id': account.pk,
-            'user': account.user.get_full_name(),
-            'name': account.name,
-            'description': account.description,
-            'money': account.money,
-            'register_date': account.register_date,
-            'delete_date': account.delete_date,
-            'is_active': account.is_active
-        })
+    response = [serialize(account) for account in accounts]
 
     if response:
-        return Response({'accounts': response}, status=status.HTTP_200_OK)
+        return Response({'accounts': response, 'next': next_cursor}, status=status.HTTP_200_OK)
     else:
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@read_only
+@condition(etag_func=user_etag)
 @api_view(['GET'])
+@cache_user_response('accounts')
 def view_user_accounts(request, user_id):
     """
-    This function return all active accounts of a user
+    This function return all active accounts of a user, the response is cached until the user changes its accounts or
+    movements
     :param request: petition method GET
     :param user_id: id user
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {accounts: [{id, name, description, money}]}
     """
     try:
-        user = User.objects.get(pk=user_id)
-        accounts = Account.objects.filter(user=user, is_active=True).order_by('name')
+        user = User.all_objects.only('id').get(pk=user_id)
+        keys = ACCOUNT_FIELDS.get_keys(request)
+        accounts = ACCOUNT_FIELDS.select(Account.objects.filter(user=user), keys).order_by('name')
+        serialize = ACCOUNT_FIELDS.serializer(keys)
 
-        response = []
-
-        for account in accounts:
-            response.append({
-                'id': account.pk,
-                'name': account.name,
-                'description': account.description,
-                'money': account.money,
-            })
+        response = [serialize(account) for account in accounts]
 
         if response:
             return Response({'accounts': response}, status=status.HTTP_200_OK)
@@ -242,33 +337,59 @@ def view_user_accounts(request, user_id):
             return Response(status=status.HTTP_204_NO_CONTENT)
     except User.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+@read_only
+@condition(etag_func=owner_etag(Account))
 @api_view(['GET'])
 def view_single_account(request, account_id):
     """
     This function return a account
     :param request: petition method GET
     :param account_id: id account
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {account: {id, name, description, money}}
     """
     try:
-        account = Account.objects.get(pk=account_id)
-
-        if account.is_active:
+        keys = ACCOUNT_FIELDS.get_keys(request)
+        account = ACCOUNT_FIELDS.select(Account.objects, keys).get(pk=account_id)
 
-            response = {
-                'id': account.pk,
-                'name': account.name,
-                'description': account.description,
-                'money': account.money,
-            }
+        response = ACCOUNT_FIELDS.serializer(keys)(account)
 
-            return Response({'account': response}, status=status.HTTP_200_OK)
-        else:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response({'account': response}, status=status.HTTP_200_OK)
     except Account.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@api_view(['GET'])
+def view_many_accounts(request):
+    """
+    This function return many accounts with one query, instead of one request per account
+    :param request: petition method GET
+    :parameter ids: comma separated list of at most API_MAX_IDS id accounts
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {accounts: {id: {id, name, description, money} or null when the account does not exist or was deleted}}
+    """
+    try:
+        ids = get_ids(request)
+        keys = ACCOUNT_FIELDS.get_keys(request)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    accounts = ACCOUNT_FIELDS.select(Account.objects, keys).in_bulk(ids)
+    serialize = ACCOUNT_FIELDS.serializer(keys)
+
+    response = OrderedDict()
+
+    for pk in ids:
+        response[pk] = serialize(accounts[pk]) if pk in accounts else None
+
+    return Response({'accounts': response}, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -285,12 +406,13 @@ def register_account(request):
     """
     if request.method == 'POST':
         try:
-            user = User.objects.get(pk=request.data['user_id'])
+            user = User.all_objects.get(pk=request.data['user_id'])
             name = request.data['name']
             description = request.data['description']
             money = request.data['money']
 
-            Account.objects.create(user=user, name=name, description=description, money=money)
+            Account.objects.create(user=user, name=name, description=description, money=money, initial_money=money,
+                                   version=invalidate_user(user.pk))
 
             return Response(status=status.HTTP_200_OK)
         except User.DoesNotExist:
@@ -299,6 +421,35 @@ def register_account(request):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+@read_only
+@condition(etag_func=owner_etag(Account))
+@api_view(['GET'])
+def view_account_balance(request, account_id):
+    """
+    This function return the balance that a account had at the end of a day
+    :param request: petition method GET
+    :param account_id: id account
+    :parameter date: YYYY-MM-DD (optional, today by default)
+    :return: {balance: {account, date, balance}}
+    """
+    try:
+        account = Account.objects.only('id', 'initial_money').get(pk=account_id)
+        day = Movement._meta.get_field('date').to_python(request.query_params.get('date') or None)
+        day = day or datetime.today().date()
+
+        response = {
+            'account': account.pk,
+            'date': day,
+            'balance': balance_on(account, day),
+        }
+
+        return Response({'balance': response}, status=status.HTTP_200_OK)
+    except Account.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValidationError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @csrf_exempt
 def update_account(request):
@@ -313,21 +464,30 @@ def update_account(request):
     """
     if request.method == 'POST':
         try:
-            account = Account.objects.get(pk=request.data['account_id'])
+            account = Account.all_objects.get(pk=request.data['account_id'])
             name = request.data['name']
             description = request.data['description']
-            money = request.data['money']
+            money = Account._meta.get_field('money').to_python(request.data['money'])
 
             account.name = name
             account.description = description
-            account.money = money
 
-            account.save()
+            with transaction.atomic():
+                account.version = invalidate_user(account.user_id)
+                account.save(update_fields=['name', 'description', 'version'])
+
+                # The new money is the balance the user sees from now on, the difference with the stored one is moved
+                # to the initial money so that reconcile_balances keeps it
+                accounts = Account.all_objects.filter(pk=account.pk)
+                accounts.update(initial_money=F('initial_money') + (money - F('money')))
+                accounts.update(money=money)
+                # Every past balance of the account moves with its initial money
+                BalanceSnapshot.objects.filter(account=account).delete()
 
             return Response(status=status.HTTP_200_OK)
         except Account.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        except KeyError:
+        except (KeyError, ValidationError):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -342,10 +502,11 @@ def delete_account(request):
     """
     if request.method == 'POST':
         try:
-            account = Account.objects.get(pk=request.data['account_id'])
+            account = Account.all_objects.get(pk=request.data['account_id'])
 
             account.delete_date = datetime.today()
             account.is_active = False
+            account.version = invalidate_user(account.user_id)
 
             account.save()
 
@@ -359,110 +520,236 @@ def delete_account(request):
 # Section of movements
 
 
+MOVEMENT_ADMIN_FIELDS = Fieldset(
+    attribute('id'),
+    ('user', ('user__full_name',), lambda movement: movement.user.get_full_name()),
+    attribute('category', 'category__name'),
+    attribute('account', 'account__name'),
+    attribute('amount'),
+    attribute('type'),
+    attribute('date'),
+    attribute('concept'),
+    attribute('account_transfer'),
+    attribute('register_date'),
+    attribute('delete_date'),
+    attribute('is_active'),
+)
+
+MOVEMENT_FIELDS = Fieldset(
+    attribute('id'),
+    attribute('category', 'category__name'),
+    attribute('account', 'account__name'),
+    attribute('amount'),
+    attribute('type'),
+    attribute('date'),
+    attribute('concept'),
+    attribute('account_transfer'),
+)
+
+# Fields of the sideload format of view_user_movements, the names are sent apart
+MOVEMENT_SIDELOAD_FIELDS = Fieldset(
+    attribute('id'),
+    ('category_id', ('category',), attrgetter('category_id')),
+    ('account_id', ('account',), attrgetter('account_id')),
+    attribute('amount'),
+    attribute('type'),
+    attribute('date'),
+    attribute('concept'),
+    attribute('account_transfer'),
+)
+
+
+@read_only
 @api_view(['GET'])
 def view_all_movements(request):
     """
-    This function return all movements in the data base
+    This function return a page of all movements in the data base, or all of them as a stream
     :param request: petition method GET
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: movements per page (optional)
+    :parameter stream: json or ndjson to stream every movement instead of a page (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {movements: [{id, user, category, account, amount, type, date, concept, account_transfer, register_date,
-              delete_date, is_active}]}
-    """
-    movements = Movement.objects.all().order_by('user')
-
-    response = []
-
-    for movement in movements:
-        response.append({
-            'id': movement.pk,
-            'user': movement.user.get_full_name(),
-            'category': movement.category.name,
-            'account': movement.account.name,
-            'amount': movement.amount,
-            'type': movement.type,
-            'date': movement.date,
-            'concept': movement.concept,
-            'account_transfer': movement.account_transfer,
-            'register_date': movement.register_date,
-            'delete_date': movement.delete_date,
-            'is_active': movement.is_active,
-        })
+              delete_date, is_active}], next}
+    """
+    try:
+        keys = MOVEMENT_ADMIN_FIELDS.get_keys(request)
+        movements = MOVEMENT_ADMIN_FIELDS.select(Movement.all_objects, keys, ('id', 'user'))
+        serialize = MOVEMENT_ADMIN_FIELDS.serializer(keys)
+
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_response(movements, ('user_id', 'id'), 'movements', serialize, stream_format)
+
+        movements, next_cursor = paginate(movements, request, ('user_id', 'id'))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    response = [serialize(movement) for movement in movements]
 
     if response:
-        return Response({'movements': response}, status=status.HTTP_200_OK)
+        return Response({'movements': response, 'next': next_cursor}, status=status.HTTP_200_OK)
     else:
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@read_only
+@condition(etag_func=user_etag)
 @api_view(['GET'])
 def view_user_movements(request, user_id):
     """
-    This function return all active movements of a user
+    This function return a page of the active movements of a user ordered by date
     :param request: petition method GET
     :param user_id: id user
-    :return: {movements: [{id, category, account, amount, type, date, concept, account_transfer}]}
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: movements per page (optional)
+    :parameter archived: 1 to also return the active movements moved to the archive (optional)
+    :parameter sideload: 1 to return the ids of the category and account of each movement and their names once in
+               categories and accounts (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {movements: [{id, category, account, amount, type, date, concept, account_transfer}], next} or with
+             sideload {movements: [{id, category_id, account_id, amount, type, date, concept, account_transfer}],
+             categories: {id: {id, name}}, accounts: {id: {id, name}}, next}
     """
     try:
-        user = User.objects.get(pk=user_id)
-        movements = Movement.objects.filter(user=user, is_active=True).order_by('date')
-
-        response = []
-
-        for movement in movements:
-            response.append({
-                'id': movement.pk,
-                'category': movement.category.name,
-                'account': movement.account.name,
-                'amount': movement.amount,
-                'type': movement.type,
-                'date': movement.date,
-                'concept': movement.concept,
-                'account_transfer': movement.account_transfer,
-            })
+        user = User.all_objects.only('id').get(pk=user_id)
+        sideload = request.query_params.get('sideload') == '1'
+        # With sideload the names are read once per category and account after the page, instead of joined to every
+        # movement
+        fieldset = MOVEMENT_SIDELOAD_FIELDS if sideload else MOVEMENT_FIELDS
+        keys = fieldset.get_keys(request)
+
+        querysets = [Movement.objects.filter(user=user)]
+        if request.query_params.get('archived') == '1':
+            querysets.append(ArchivedMovement.objects.filter(user=user))
+        querysets = [fieldset.select(movements, keys, ('id', 'date')) for movements in querysets]
+
+        if len(querysets) > 1:
+            movements, next_cursor = paginate_union(querysets, request, ('date', 'id'))
+        else:
+            movements, next_cursor = paginate(querysets[0], request, ('date', 'id'))
 
-        if response:
-            return Response({'movements': response}, status=status.HTTP_200_OK)
+        serialize = fieldset.serializer(keys)
+
+        response = [serialize(movement) for movement in movements]
+
+        if response and sideload:
+            sideloaded = {'movements': response, 'next': next_cursor}
+            # Only the categories and accounts whose ids were requested are sent
+            for key, name, model in (('category_id', 'categories', Category), ('account_id', 'accounts', Account)):
+                if key in keys:
+                    rows = model.all_objects.only('id', 'name').in_bulk({row[key] for row in response})
+                    sideloaded[name] = OrderedDict((pk, {'id': pk, 'name': rows[pk].name}) for pk in sorted(rows))
+
+            return Response(sideloaded, status=status.HTTP_200_OK)
+        elif response:
+            return Response({'movements': response, 'next': next_cursor}, status=status.HTTP_200_OK)
         else:
             return Response(status=status.HTTP_204_NO_CONTENT)
     except User.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+@read_only
+@condition(etag_func=owner_etag(Movement))
 @api_view(['GET'])
 def view_single_movement(request, movement_id):
     """
     This function return a movement
     :param request: petition method GET
     :param movement_id: id movement
+    :parameter archived: 1 to look for the movement in the archive when it is not in the hot table (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {movements: {id, category, account, amount, type, date, concept, account_transfer}}
     """
     try:
-        movement = Movement.objects.get(pk=movement_id)
-
-        if movement.is_active:
-
-            response = {
-                'id': movement.pk,
-                'category': movement.category.name,
-                'account': movement.account.name,
-                'amount': movement.amount,
-                'type': movement.type,
-                'date': movement.date,
-                'concept': movement.concept,
-                'account_transfer': movement.account_transfer,
-            }
-
-            return Response({'movement': response}, status=status.HTTP_200_OK)
-        else:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+        keys = MOVEMENT_FIELDS.get_keys(request)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        movement = MOVEMENT_FIELDS.select(Movement.objects, keys).get(pk=movement_id)
     except Movement.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('archived') != '1':
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            movement = MOVEMENT_FIELDS.select(ArchivedMovement.objects, keys).get(pk=movement_id)
+        except ArchivedMovement.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+    response = MOVEMENT_FIELDS.serializer(keys)(movement)
+
+    return Response({'movement': response}, status=status.HTTP_200_OK)
+
+
+@read_only
+@api_view(['GET'])
+def view_many_movements(request):
+    """
+    This function return many movements with their category and account in one query, instead of one request per
+    movement
+    :param request: petition method GET
+    :parameter ids: comma separated list of at most API_MAX_IDS id movements
+    :parameter archived: 1 to look for the movements that are not in the hot table in the archive (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {movements: {id: {id, category, account, amount, type, date, concept, account_transfer} or null when the
+              movement does not exist or was deleted}}
+    """
+    try:
+        ids = get_ids(request)
+        keys = MOVEMENT_FIELDS.get_keys(request)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    movements = MOVEMENT_FIELDS.select(Movement.objects, keys).in_bulk(ids)
+
+    missing = [pk for pk in ids if pk not in movements]
+    if missing and request.query_params.get('archived') == '1':
+        movements.update(MOVEMENT_FIELDS.select(ArchivedMovement.objects, keys).in_bulk(missing))
+
+    serialize = MOVEMENT_FIELDS.serializer(keys)
+
+    response = OrderedDict()
+
+    for pk in ids:
+        response[pk] = serialize(movements[pk]) if pk in movements else None
+
+    return Response({'movements': response}, status=status.HTTP_200_OK)
+
+
+def _relation_errors(user_id, category_id, account_id, account_transfer):
+    """
+    This function check that the category and the accounts of a movement are active and belong to its user, the same
+    check register_movements does for each item
+    :param user_id: id user owner of the movement
+    :param category_id: id category
+    :param account_id: id account
+    :param account_transfer: id transfer account or None
+    :return: {field: [errors]}, empty when everything was found
+    """
+    errors = {}
+    if not Category.objects.filter(pk=category_id, user_id=user_id).exists():
+        errors['category_id'] = ['Category not found.']
+
+    accounts = set(Account.objects.filter(
+        user_id=user_id, pk__in=[account_id] if account_transfer is None else [account_id, account_transfer]
+    ).values_list('pk', flat=True))
+    if account_id not in accounts:
+        errors['account_id'] = ['Account not found.']
+    if account_transfer is not None and account_transfer not in accounts:
+        errors['account_transfer_id'] = ['Account not found.']
+
+    return errors
 
 
 @api_view(['POST'])
 @csrf_exempt
 def register_movement(request):
     """
-    This function register a movement
+    This function register a movement and applies it to the balance of its accounts
     :param request: petition method POST
     :parameter user_id: id user
     :parameter category_id: id category
@@ -472,26 +759,37 @@ def register_movement(request):
     :parameter date: movement date
     :parameter concept: movement concept
     :parameter account_transfer_id: movement account transfer (can be null)
-    :return: status code 200
+    :return: status code 200, 400 with {field: [errors]} when the category or an account is not an active one of the
+             user
     """
     if request.method == 'POST':
         try:
-            user = User.objects.get(pk=request.data['user_id'])
-            category = Category.objects.get(pk=request.data['category_id'])
-            account = Account.objects.get(pk=request.data['account_id'])
-            amount = request.data['amount']
+            user = User.all_objects.get(pk=request.data['user_id'])
+            category_id = int(request.data['category_id'])
+            account_id = int(request.data['account_id'])
+            amount = to_amount(request.data['amount'])
             type_movement = request.data['type']
             date = request.data['date']
             concept = request.data['concept']
-            account_transfer = request.data['account_transfer_id']
+            account_transfer = to_account_transfer(request.data['account_transfer_id'])
+
+            errors = _relation_errors(user.pk, category_id, account_id, account_transfer)
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
-            Movement.objects.create(user=user, category=category, account=account, amount=amount, type=type_movement,
-                                    date=date, concept=concept, account_transfer=account_transfer)
+            with transaction.atomic():
+                movement = Movement.objects.create(user=user, category_id=category_id, account_id=account_id,
+                                                   amount=amount, type=type_movement, date=date, concept=concept,
+                                                   account_transfer=account_transfer,
+                                                   version=invalidate_user(user.pk))
+                apply_movement(movement)
+                add_to_rollups([movement])
+                invalidate_snapshots([movement])
 
             return Response(status=status.HTTP_200_OK)
-        except User.DoesNotExist or Category.DoesNotExist or Account.DoesNotExist:
+        except User.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        except KeyError:
+        except (KeyError, ValueError, ValidationError):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -499,7 +797,7 @@ def register_movement(request):
 @csrf_exempt
 def update_movement(request):
     """
-    This function update a movement
+    This function update a movement and moves its effect on the balances from the old accounts to the new ones
     :param request: petition method POST
     :parameter movement_id: movement id
     :parameter category_id: id category
@@ -509,33 +807,52 @@ def update_movement(request):
     :parameter date: movement date
     :parameter concept: movement concept
     :parameter account_transfer_id: movement account transfer (can be null)
-    :return: status code 200
+    :return: status code 200, 400 with {field: [errors]} when the category or an account is not an active one of the
+             owner of the movement
     """
     if request.method == 'POST':
         try:
-            movement = Movement.objects.get(pk=request.data['movement_id'])
-            category = Category.objects.get(pk=request.data['category_id'])
-            account = Account.objects.get(pk=request.data['account_id'])
-            amount = request.data['amount']
+            category_id = int(request.data['category_id'])
+            account_id = int(request.data['account_id'])
+            amount = to_amount(request.data['amount'])
             type_movement = request.data['type']
             date = request.data['date']
             concept = request.data['concept']
-            account_transfer = request.data['account_transfer_id']
+            account_transfer = to_account_transfer(request.data['account_transfer_id'])
+
+            with transaction.atomic():
+                movement = Movement.all_objects.select_for_update().get(pk=request.data['movement_id'])
+
+                errors = _relation_errors(movement.user_id, category_id, account_id, account_transfer)
+                if errors:
+                    return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+                movement.version = invalidate_user(movement.user_id)
+
+                if movement.is_active:
+                    revert_movement(movement)
+                    add_to_rollups([movement], -1)
+                    invalidate_snapshots([movement])
 
-            movement.category = category
-            movement.account = account
-            movement.amount = amount
-            movement.type = type_movement
-            movement.date = date
-            movement.concept = concept
-            movement.account_transfer = account_transfer
+                movement.category_id = category_id
+                movement.account_id = account_id
+                movement.amount = amount
+                movement.type = type_movement
+                movement.date = date
+                movement.concept = concept
+                movement.account_transfer = account_transfer
 
-            movement.save()
+                movement.save()
+
+                if movement.is_active:
+                    apply_movement(movement)
+                    add_to_rollups([movement])
+                    invalidate_snapshots([movement])
 
             return Response(status=status.HTTP_200_OK)
-        except Movement.DoesNotExist or Category.DoesNotExist or Account.DoesNotExist:
+        except Movement.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        except KeyError:
+        except (KeyError, ValueError, ValidationError):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -543,22 +860,293 @@ def update_movement(request):
 @csrf_exempt
 def delete_movement(request):
     """
-    This function change the attribute from is_active to false and records the date of the operation
+    This function change the attribute from is_active to false, records the date of the operation and reverts
+    the movement from the balance of its accounts
     :param request:
     :parameter movement_id: id movement
     :return: status code 200
     """
     if request.method == 'POST':
         try:
-            movement = Movement.objects.get(pk=request.data['movement_id'])
+            with transaction.atomic():
+                movement = Movement.all_objects.select_for_update().get(pk=request.data['movement_id'])
+                movement.version = invalidate_user(movement.user_id)
+
+                if movement.is_active:
+                    revert_movement(movement)
+                    add_to_rollups([movement], -1)
+                    invalidate_snapshots([movement])
 
-            movement.delete_date = datetime.today()
-            movement.is_active = False
+                movement.delete_date = datetime.today()
+                movement.is_active = False
 
-            movement.save()
+                movement.save()
 
             return Response(status=status.HTTP_200_OK)
         except Movement.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
         except KeyError:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@condition(etag_func=user_etag)
+@api_view(['GET'])
+def view_movement_summary(request, user_id):
+    """
+    This function return the sum and count of the active movements of a user per period, computed in the data base
+    :param request: petition method GET
+    :param user_id: id user
+    :parameter period: day, week, month or year (default month)
+    :parameter group: comma separated list of category, account and type (optional)
+    :parameter start: first date included, YYYY-MM-DD (optional)
+    :parameter end: last date included, YYYY-MM-DD (optional)
+    :return: {summary: [{period, category, account, type, total, count}]} with only the requested groups
+    """
+    try:
+        user = User.all_objects.only('id').get(pk=user_id)
+        period = request.query_params.get('period', 'month')
+        group = [name for name in request.query_params.get('group', '').split(',') if name]
+        start = Movement._meta.get_field('date').to_python(request.query_params.get('start') or None)
+        end = Movement._meta.get_field('date').to_python(request.query_params.get('end') or None)
+
+        if period not in PERIODS or any(name not in GROUPS for name in group) or len(set(group)) != len(group):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = movement_summary(user.pk, period, group, start, end)
+
+        if response:
+            return Response({'summary': response}, status=status.HTTP_200_OK)
+        else:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    except User.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    except ValidationError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@condition(etag_func=user_etag)
+@api_view(['GET'])
+def view_balance_series(request, user_id):
+    """
+    This function return the balance of the active accounts of a user, or one of them, at the end of every day with
+    movements in a range
+    :param request: petition method GET
+    :param user_id: id user
+    :parameter account: id account (optional, all the active accounts by default)
+    :parameter start: first date included, YYYY-MM-DD (optional)
+    :parameter end: last date included, YYYY-MM-DD (optional)
+    :parameter points: maximum points per account, the series is downsampled when it has more (optional)
+    :return: {series: [{account, name, opening, points: [{date, balance}]}]} where opening is the balance before start
+    """
+    try:
+        user = User.all_objects.only('id').get(pk=user_id)
+        accounts = Account.objects.filter(user=user).only('id', 'name', 'initial_money')
+        if request.query_params.get('account'):
+            accounts = accounts.filter(pk=int(request.query_params['account']))
+        start = Movement._meta.get_field('date').to_python(request.query_params.get('start') or None)
+        end = Movement._meta.get_field('date').to_python(request.query_params.get('end') or None)
+        points = int(request.query_params.get('points') or 0)
+
+        if points < 0:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        accounts = list(accounts.order_by('name', 'id'))
+        if not accounts and request.query_params.get('account'):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        response = balance_series(accounts, start, end, points)
+
+        if response:
+            return Response({'series': response}, status=status.HTTP_200_OK)
+        else:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    except User.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    except (ValueError, ValidationError):
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@condition(etag_func=user_etag)
+@api_view(['GET'])
+def search_movements(request, user_id):
+    """
+    This function return a page of the active movements of a user whose concept has the words searched, the most
+    relevant first, using the full text index of the data base
+    :param request: petition method GET
+    :param user_id: id user
+    :parameter q: words to search, a word also matches the longer words that start with it
+    :parameter start: first date included, YYYY-MM-DD (optional)
+    :parameter end: last date included, YYYY-MM-DD (optional)
+    :parameter account: id account (optional)
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: movements per page (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
+    :return: {movements: [{id, category, account, amount, type, date, concept, account_transfer}], next}
+    """
+    try:
+        user = User.all_objects.only('id').get(pk=user_id)
+        words = search_words(request.query_params.get('q', ''))
+        start = Movement._meta.get_field('date').to_python(request.query_params.get('start') or None)
+        end = Movement._meta.get_field('date').to_python(request.query_params.get('end') or None)
+        account_id = int(request.query_params.get('account') or 0)
+        page_size = get_page_size(request)
+        # (score, id)
+        after = decode_cursor(request.query_params['cursor'], 2, ((float,) + six.integer_types, six.integer_types)) \
+            if request.query_params.get('cursor') else None
+        keys = MOVEMENT_FIELDS.get_keys(request)
+
+        if not words:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        found = search_concepts(user.pk, words, start, end, account_id, after, page_size + 1)
+        next_cursor = None
+        if len(found) > page_size:
+            found = found[:page_size]
+            pk, score = found[-1]
+            next_cursor = encode_cursor([score, pk])
+
+        movements = MOVEMENT_FIELDS.select(Movement.objects, keys).in_bulk([pk for pk, _ in found])
+        serialize = MOVEMENT_FIELDS.serializer(keys)
+
+        response = [serialize(movements[pk]) for pk, _ in found if pk in movements]
+
+        if response:
+            return Response({'movements': response, 'next': next_cursor}, status=status.HTTP_200_OK)
+        else:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+    except User.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    except (ValueError, ValidationError):
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+@read_only
+@condition(etag_func=user_etag)
+@api_view(['GET'])
+def sync(request, user_id):
+    """
+    This function return the categories, accounts and movements of a user created, updated or deleted since the last
+    sync of the client, so it can keep a local copy without downloading everything again
+    :param request: petition method GET
+    :param user_id: id user
+    :parameter token: token of the previous sync (optional, without it every active row is returned)
+    :return: {categories: [{id, name, description, category_color}], accounts: [{id, name, description, money}],
+              movements: [{id, category_id, account_id, amount, type, date, concept, account_transfer}],
+              deleted: {categories, accounts, movements}, full, token} where full tells that the lists have every
+              active row and the client must drop what it had, and token goes in the next sync
+    """
+    try:
+        since = decode_cursor(request.query_params['token'], 1, (six.integer_types,))[0] \
+            if request.query_params.get('token') else None
+
+        response = changes_since(int(user_id), since)
+        response['token'] = encode_cursor([response.pop('version')])
+
+        return Response(response, status=status.HTTP_200_OK)
+    except User.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    except InvalidCursor:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+
+def _parse_movement(user, item):
+    """
+    This function build an unsaved movement from an item of register_movements and validates its fields
+    :param user: owner of the movement
+    :param item: {category_id, account_id, amount, type, date, concept, account_transfer_id}
+    :return: (Movement, None) or (None, {field: [errors]})
+    """
+    if not isinstance(item, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+
+    try:
+        movement = Movement(user=user, category_id=int(item['category_id']), account_id=int(item['account_id']),
+                            amount=item['amount'], type=item['type'], date=item['date'], concept=item['concept'],
+                            account_transfer=to_account_transfer(item.get('account_transfer_id')))
+    except KeyError as error:
+        return None, {error.args[0]: ['This field is required.']}
+    except (TypeError, ValueError, AttributeError):
+        return None, {'non_field_errors': ['Invalid id.']}
+
+    try:
+        movement.clean_fields(exclude=['user', 'category', 'account'])
+    except ValidationError as error:
+        return None, error.message_dict
+
+    return movement, None
+
+
+@api_view(['POST'])
+@csrf_exempt
+def register_movements(request):
+    """
+    This function register many movements of a user in a single transaction, for example a bank statement. The
+    categories and accounts of all the movements are validated with one query per model and the valid movements are
+    inserted with bulk inserts; an invalid movement does not prevent the others from being registered.
+    :param request: petition method POST with a json body
+    :parameter user_id: id user
+    :parameter movements: [{category_id, account_id, amount, type, date, concept, account_transfer_id}], at most
+               API_MAX_BULK_MOVEMENTS
+    :return: {created, results: [{index, status, errors}]} where status is 200 for a registered movement, 400 for
+             invalid fields and 404 for a category or account that does not exist or belongs to another user
+    """
+    if request.method == 'POST':
+        try:
+            user = User.all_objects.only('id').get(pk=request.data['user_id'])
+            items = request.data['movements']
+
+            if not isinstance(items, list) or len(items) > getattr(settings, 'API_MAX_BULK_MOVEMENTS', 1000):
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+
+            parsed = [_parse_movement(user, item) for item in items]
+            movements = [movement for movement, _ in parsed if movement is not None]
+
+            categories = set(Category.objects.filter(
+                user=user, pk__in={movement.category_id for movement in movements}
+            ).values_list('pk', flat=True))
+            accounts = set(Account.objects.filter(
+                user=user, pk__in={movement.account_id for movement in movements} |
+                {movement.account_transfer for movement in movements if movement.account_transfer is not None}
+            ).values_list('pk', flat=True))
+
+            results = []
+            valid = []
+            for index, (movement, errors) in enumerate(parsed):
+                if errors:
+                    results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+                    continue
+
+                errors = {}
+                if movement.category_id not in categories:
+                    errors['category_id'] = ['Category not found.']
+                if movement.account_id not in accounts:
+                    errors['account_id'] = ['Account not found.']
+                if movement.account_transfer is not None and movement.account_transfer not in accounts:
+                    errors['account_transfer_id'] = ['Account not found.']
+
+                if errors:
+                    results.append({'index': index, 'status': status.HTTP_404_NOT_FOUND, 'errors': errors})
+                else:
+                    results.append({'index': index, 'status': status.HTTP_200_OK})
+                    valid.append(movement)
+
+            if valid:
+                with transaction.atomic():
+                    version = invalidate_user(user.pk)
+                    for movement in valid:
+                        movement.version = version
+
+                    Movement.objects.bulk_create(valid, batch_size=getattr(settings, 'API_BULK_INSERT_SIZE', 500))
+                    apply_deltas((delta for movement in valid for delta in movement_deltas(movement)), user.pk,
+                                 version)
+                    add_to_rollups(valid)
+                    invalidate_snapshots(valid)
+
+            return Response({'created': len(valid), 'results': results}, status=status.HTTP_200_OK)
+        except User.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        except KeyError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
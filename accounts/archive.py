@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.cache import invalidate_user
+from accounts.models import ArchivedMovement, Movement
+
+# Fields copied from the hot table to the archive
+ARCHIVED_FIELDS = ('id', 'user_id', 'category_id', 'account_id', 'amount', 'type', 'date', 'concept',
+                   'account_transfer', 'register_date', 'delete_date', 'is_active', 'version')
+
+
+def archivable(retention_days, older_than_years=None, today=None):
+    """
+    This function build the filter of the movements that can leave the hot table: the soft deleted ones deleted more
+    than retention_days ago and, when older_than_years is given, every movement dated before that many years ago
+    :param retention_days: days that a soft deleted movement stays in the hot table
+    :param older_than_years: age in years of the active movements to archive (optional)
+    :param today: date (optional)
+    :return: Q object
+    """
+    today = today or date.today()
+    condition = Q(is_active=False, delete_date__lte=today - timedelta(days=retention_days))
+
+    if older_than_years:
+        try:
+            cutoff = today.replace(year=today.year - older_than_years)
+        except ValueError:  # 29 of february
+            cutoff = today.replace(year=today.year - older_than_years, day=28)
+        condition |= Q(date__lt=cutoff)
+
+    return condition
+
+
+def newest_movement_id():
+    """
+    This function return the id of the newest movement of the hot table, the one that is never archived. The archive
+    keeps the ids of the hot table, and some data bases (MySQL before 8) restart the auto increment from the largest
+    id left in the table after a restart; while that movement stays, no new movement can get an archived id.
+    :return: id movement or None
+    """
+    return Movement.all_objects.order_by('-pk').values_list('pk', flat=True).first()
+
+
+def archive_movements(ids, condition):
+    """
+    This function move a batch of movements to the archive in one short transaction. The rows are locked and the
+    condition checked again, so a movement that a concurrent request changed meanwhile is skipped, and the newest
+    movement is left in the hot table, see newest_movement_id. The balances, rollups and snapshots are not touched:
+    they keep counting the archived active movements.
+    :param ids: list of id movements
+    :param condition: Q object from archivable
+    :return: number of movements archived
+    """
+    with transaction.atomic():
+        movements = list(Movement.all_objects.select_for_update().filter(condition, pk__in=ids).exclude(
+            pk=newest_movement_id()
+        ).values(*ARCHIVED_FIELDS))
+        if not movements:
+            return 0
+
+        ArchivedMovement.all_objects.bulk_create([ArchivedMovement(**movement) for movement in movements])
+        Movement.all_objects.filter(pk__in=[movement['id'] for movement in movements]).delete()
+
+        for user_id in set(movement['user_id'] for movement in movements):
+            invalidate_user(user_id)
+
+    return len(movements)
+
+
+def movement_sources():
+    """
+    This function return the querysets that hold the active movements, the hot table and the archive. The balances,
+    rollups and summaries read both, so archiving never changes them.
+    :return: list of querysets
+    """
+    return [Movement.objects.all(), ArchivedMovement.objects.all()]
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, router
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+from Denarius.Enums import MovementTypes
+from accounts.archive import movement_sources
+from accounts.cache import invalidate_user
+from accounts.models import Account, Movement
+
+CENT = Decimal('0.01')
+
+
+def to_amount(value):
+    """
+    This function convert a value received from the client to the Decimal stored in Movement.amount
+    :param value: amount as str, int, float or Decimal
+    :return: Decimal
+    :raise ValidationError: the value is not a valid amount
+    """
+    return Movement._meta.get_field('amount').to_python(value)
+
+
+def to_account_transfer(value):
+    """
+    This function convert the account_transfer_id received from the client to the value stored in the movement
+    :param value: id account, empty or None
+    :return: int or None
+    """
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def movement_deltas(movement):
+    """
+    This function return how a movement changes the balance of the accounts it touches. A movement with
+    account_transfer moves the amount from its account to the transfer account; otherwise an income adds the amount
+    to its account and an expense subtracts it. Other types do not change balances.
+    :param movement: Movement (or any object with account_id, amount, type and account_transfer)
+    :return: [(id account, delta)]
+    """
+    amount = to_amount(movement.amount)
+    movement_type = (movement.type or '').lower()
+
+    if movement.account_transfer is not None:
+        return [(movement.account_id, -amount), (movement.account_transfer, amount)]
+    if movement_type == MovementTypes.Income:
+        return [(movement.account_id, amount)]
+    if movement_type in (MovementTypes.Expense, MovementTypes.Transfer):
+        return [(movement.account_id, -amount)]
+    return []
+
+
+def apply_deltas(deltas, user_id, version):
+    """
+    This function add the deltas to the stored balances with an in place UPDATE, one per account, and stores the data
+    version in the accounts whose balance changes. An account of another user, e.g. the destination of an old transfer,
+    gets a new data version of its own user, so it shows up in the next sync of its owner.
+    :param deltas: iterable of (id account, delta)
+    :param user_id: id user of the write
+    :param version: data version of the write
+    """
+    totals = defaultdict(int)
+    for account_id, delta in deltas:
+        totals[account_id] += delta
+
+    for account_id, delta in totals.items():
+        if not delta:
+            continue
+
+        updated = Account.all_objects.filter(pk=account_id, user_id=user_id).update(
+            money=F('money') + delta, version=version
+        )
+        if updated:
+            continue
+
+        owner_id = Account.all_objects.filter(pk=account_id).values_list('user_id', flat=True).first()
+        if owner_id is not None:
+            Account.all_objects.filter(pk=account_id).update(money=F('money') + delta,
+                                                             version=invalidate_user(owner_id))
+
+
+def apply_movement(movement):
+    """
+    This function add the effect of an active movement to the balances of its accounts
+    :param movement: Movement with the version of the current write
+    """
+    apply_deltas(movement_deltas(movement), movement.user_id, movement.version)
+
+
+def revert_movement(movement):
+    """
+    This function remove the effect of a movement from the balances of its accounts
+    :param movement: Movement as it was when its effect was applied, with the version of the current write
+    """
+    apply_deltas(((account_id, -delta) for account_id, delta in movement_deltas(movement)), movement.user_id,
+                 movement.version)
+
+
+def signed_amount():
+    """
+    This function return the expression of the change that an active movement makes to the balance of its own account,
+    the counterpart in the transfer account is Sum('amount') grouped by account_transfer
+    :return: Case expression
+    """
+    return Case(
+        When(account_transfer__isnull=False, then=F('amount') * -1),
+        When(type__iexact=MovementTypes.Income, then=F('amount')),
+        When(Q(type__iexact=MovementTypes.Expense) | Q(type__iexact=MovementTypes.Transfer), then=F('amount') * -1),
+        default=Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def to_decimal(value):
+    # SQLite returns the sums of raw queries as float
+    return Decimal(str(value)).quantize(CENT)
+
+
+def read_connection():
+    """
+    This function return the connection that the reads of the movements use, a replica when the current request
+    reads from them, so the raw queries go to the same data base as the ORM ones
+    :return: connection
+    """
+    return connections[router.db_for_read(Movement)]
+
+
+def deltas_sql(connection, account_ids, fields=(), **filters):
+    """
+    This function return the SQL of how much the active movements change some accounts, grouped by account and the
+    given fields, as the union of the movements of the accounts and the transfers they received, from the hot table
+    and the archive
+    :param connection: connection that runs the SQL, see read_connection
+    :param account_ids: list of id accounts
+    :param fields: extra fields of Movement to group by, e.g. ('date',)
+    :param filters: lookups applied to the movements, e.g. date__lte=...
+    :return: (sql with columns account_id, <fields>..., delta, params)
+    """
+    parts = []
+    params = []
+    for movements in movement_sources():
+        movements = movements.filter(**filters)
+        outgoing = movements.filter(account_id__in=account_ids).values('account_id', *fields).annotate(
+            delta=Sum(signed_amount())
+        ).order_by()
+        incoming = movements.filter(account_transfer__in=account_ids).values('account_transfer', *fields).annotate(
+            delta=Sum('amount')
+        ).order_by()
+
+        for queryset in (outgoing, incoming):
+            sql, queryset_params = queryset.query.get_compiler(connection=connection).as_sql()
+            parts.append(sql)
+            params.extend(queryset_params)
+
+    return ' UNION ALL '.join(parts), tuple(params)
+
+
+def movement_totals(account_ids, after=None, until=None, using=None):
+    """
+    This function compute from the movement history, archived movements included, how much the active movements
+    changed each account with a single query
+    :param account_ids: list of id accounts
+    :param after: only count the movements after this date (optional)
+    :param until: only count the movements up to this date, included (optional)
+    :param using: data base alias, the read connection by default; pass the write one to read inside a transaction
+    :return: {id account: Decimal}
+    """
+    filters = {}
+    if after:
+        filters['date__gt'] = after
+    if until:
+        filters['date__lte'] = until
+
+    connection = connections[using] if using else read_connection()
+    sql, params = deltas_sql(connection, account_ids, **filters)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT account_id, SUM(delta) FROM (%s) deltas GROUP BY account_id' % sql, params)
+        return defaultdict(int, ((account_id, to_decimal(total)) for account_id, total in cursor if total is not None))
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import sys
+import timeit
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.core.signals import request_finished, request_started
+from django.core.urlresolvers import reverse
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils.six.moves.urllib.parse import urlencode
+
+from accounts.api.urls import urlpatterns as accounts_urlpatterns
+from accounts.models import Category, Account, Movement
+from api.pagination import encode_cursor
+from users.api.urls import urlpatterns as users_urlpatterns
+from users.models import User
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+MOVEMENT = {'amount': '125.50', 'type': 'egreso', 'date': '2018-03-15', 'concept': 'Benchmark',
+            'account_transfer_id': None}
+
+
+def _get(name, *args, **params):
+    return lambda context: ('GET', reverse(name, args=[context[arg] for arg in args]), params, None)
+
+
+def _many(name, key):
+    return lambda context: ('GET', reverse(name), {'ids': ','.join(str(pk) for pk in context[key])}, None)
+
+
+def _post(name, data):
+    return lambda context: ('POST', reverse(name), {}, data(context))
+
+
+# Request of every route: function of the benchmark context that returns (method, path, query params, json body)
+ROUTES = {
+    'api_view_all_categories': _get('api_view_all_categories'),
+    'api_view_user_categories': _get('api_view_user_categories', 'user'),
+    'api_view_single_category': _get('api_view_single_category', 'category'),
+    'api_view_many_categories': _many('api_view_many_categories', 'category_ids'),
+    'api_register_category': _post('api_register_category', lambda context: {
+        'user_id': context['user'], 'name': 'Benchmark', 'description': 'Benchmark', 'color': '#000000'
+    }),
+    'api_update_category': _post('api_update_category', lambda context: {
+        'category_id': context['category'], 'name': 'Benchmark', 'description': 'Benchmark', 'color': '#000000'
+    }),
+    'api_delete_category': _post('api_delete_category', lambda context: {'category_id': context['spare_category']}),
+
+    'api_view_all_accounts': _get('api_view_all_accounts'),
+    'api_view_user_accounts': _get('api_view_user_accounts', 'user'),
+    'api_view_single_account': _get('api_view_single_account', 'account'),
+    'api_view_many_accounts': _many('api_view_many_accounts', 'account_ids'),
+    'api_view_account_balance': _get('api_view_account_balance', 'account', date='2018-06-15'),
+    'api_register_account': _post('api_register_account', lambda context: {
+        'user_id': context['user'], 'name': 'Benchmark', 'description': 'Benchmark', 'money': '100.00'
+    }),
+    'api_update_account': _post('api_update_account', lambda context: {
+        'account_id': context['account'], 'name': 'Benchmark', 'description': 'Benchmark', 'money': '100.00'
+    }),
+    'api_delete_account': _post('api_delete_account', lambda context: {'account_id': context['spare_account']}),
+
+    'api_view_all_movements': _get('api_view_all_movements'),
+    'api_view_user_movements': _get('api_view_user_movements', 'user'),
+    'api_view_single_movement': _get('api_view_single_movement', 'movement'),
+    'api_view_many_movements': _many('api_view_many_movements', 'movement_ids'),
+    'api_register_movement': _post('api_register_movement', lambda context: dict(MOVEMENT, **{
+        'user_id': context['user'], 'category_id': context['category'], 'account_id': context['account']
+    })),
+    'api_update_movement': _post('api_update_movement', lambda context: dict(MOVEMENT, **{
+        'movement_id': context['movement'], 'category_id': context['category'], 'account_id': context['account']
+    })),
+    'api_delete_movement': _post('api_delete_movement', lambda context: {'movement_id': context['spare_movement']}),
+    'api_register_movements': _post('api_register_movements', lambda context: {
+        'user_id': context['user'],
+        'movements': [dict(MOVEMENT, category_id=context['category'], account_id=context['account'])] * 100,
+    }),
+
+    'api_view_movement_summary': _get('api_view_movement_summary', 'user', period='month', group='category,type'),
+    'api_view_balance_series': _get('api_view_balance_series', 'user', points=365),
+    'api_search_movements': _get('api_search_movements', 'user', q='renta'),
+    'api_sync': lambda context: ('GET', reverse('api_sync', args=[context['user']]), {'token': context['sync_token']},
+                                 None),
+
+    'api_view_users': _get('api_view_users'),
+    'api_register_user': _post('api_register_user', lambda context: {
+        'name': 'Benchmark', 'email': 'benchmark%d@denarius.mx' % next(context['sequence']),
+        'nickname': 'benchmark-%d' % next(context['sequence']), 'password': 'benchmark', 'birth_date': '1990-01-01',
+        'gender': 1
+    }),
+    'api_delete_user': _post('api_delete_user', lambda context: {'user_id': context['spare_user']}),
+    'api_update_user': _post('api_update_user', lambda context: {
+        'user_id': context['user'], 'name': 'Benchmark', 'birth_date': '1990-01-01', 'gender': 1
+    }),
+}
+
+
+def route_names():
+    """
+    This function return the names of every route of the accounts and users api, in the order of their urls
+    :return: list of url names
+    """
+    return [pattern.name for pattern in accounts_urlpatterns + users_urlpatterns]
+
+
+def build_context():
+    """
+    This function pick the rows used by the requests: the user with most movements, one of its categories, accounts
+    and movements, the ids of some of them for the multi-get routes, spare rows for the delete routes and a sync token
+    of its current data version
+    :return: dict
+    """
+    busiest = Movement.all_objects.values('user_id').annotate(total=Count('id')).order_by('-total').first()
+    if busiest is None:
+        raise ValueError('There are no movements, run seed_data first')
+
+    user = User.all_objects.get(pk=busiest['user_id'])
+    category_ids = list(Category.objects.filter(user=user).values_list('pk', flat=True)[:20])
+    account_ids = list(Account.objects.filter(user=user).values_list('pk', flat=True)[:20])
+    movement_ids = list(Movement.objects.filter(user=user).values_list('pk', flat=True)[:50])
+    category = Category.objects.get(pk=category_ids[0])
+    account = Account.objects.get(pk=account_ids[0])
+    movement = Movement.objects.get(pk=movement_ids[0])
+    sync_token = encode_cursor([user.data_version])
+
+    spare_user = User.objects.create(nickname='benchmark-spare', email='benchmark-spare@denarius.mx')
+    spare_category = Category.objects.create(user=user, name='Spare', description='')
+    spare_account = Account.objects.create(user=user, name='Spare', description='', money=0)
+    spare_movement = Movement.objects.create(user=user, category=category, account=account, amount=1, type='egreso',
+                                             date=movement.date, concept='Spare')
+
+    return {
+        'user': user.pk, 'category': category.pk, 'account': account.pk, 'movement': movement.pk,
+        'spare_user': spare_user.pk, 'spare_category': spare_category.pk, 'spare_account': spare_account.pk,
+        'category_ids': category_ids, 'account_ids': account_ids, 'movement_ids': movement_ids,
+        'spare_movement': spare_movement.pk, 'sequence': iter(range(sys.maxsize)),
+        'movements': Movement.all_objects.filter(user=user).count(), 'sync_token': sync_token,
+    }
+
+
+def call(application, method, path, params=None, data=None, headers=None):
+    """
+    This function send a request to the WSGI application in process and consume the whole body
+    :param application: WSGI application
+    :param method: GET or POST
+    :param path: url path
+    :param params: query params
+    :param data: json body
+    :param headers: extra environ entries, e.g. {'HTTP_ACCEPT': 'application/json'}
+    :return: (status code, body)
+    """
+    body = json.dumps(data).encode('utf-8') if data is not None else b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(params or {}),
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+    }
+    environ.update(headers or {})
+    setup_testing_defaults(environ)
+
+    result = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        result['status'] = int(status.split(' ', 1)[0])
+
+    response = application(environ, start_response)
+    try:
+        content = b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+    return result['status'], content
+
+
+def percentile(values, percent):
+    """
+    This function return the nearest-rank percentile of a list of values
+    :param values: sorted list
+    :param percent: 0 to 100
+    :return: value
+    """
+    index = max(0, int(round(percent / 100.0 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def measure(application, build, iterations, warmup=2, headers=None):
+    """
+    This function send a request many times and summarize its latency, queries and memory
+    :param application: WSGI application
+    :param build: function that returns (method, path, query params, json body), called before every request
+    :param iterations: measured requests
+    :param warmup: requests sent before measuring
+    :param headers: extra environ entries
+    :return: {status, p50_ms, p95_ms, p99_ms, queries, peak_memory_kb, bytes}
+    """
+    for _ in range(warmup):
+        call(application, *build(), headers=headers)
+
+    timings = []
+    for _ in range(iterations):
+        request = build()
+        start = timeit.default_timer()
+        status, content = call(application, *request, headers=headers)
+        timings.append((timeit.default_timer() - start) * 1000)
+    timings.sort()
+
+    request = build()
+    with CaptureQueriesContext(connection) as queries:
+        call(application, *request, headers=headers)
+    # The log is cleared when the next request starts
+    query_count = len(queries)
+
+    peak = None
+    if tracemalloc:
+        request = build()
+        tracemalloc.start()
+        call(application, *request, headers=headers)
+        peak = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': query_count,
+        'peak_memory_kb': peak,
+        'bytes': len(content),
+    }
+
+
+class disconnected_request_signals(object):
+    """
+    Context manager that keeps the connection open between requests, like django.test.Client does, so the whole run
+    can happen inside one transaction that is rolled back at the end
+    """
+
+    def __enter__(self):
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+
+    def __exit__(self, *exc_info):
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+
+from users.models import User
+
+CACHEABLE_STATUS = (status.HTTP_200_OK, status.HTTP_204_NO_CONTENT)
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def data_version(user_id):
+    """
+    This function return the data version of a user as stored in the data base it reads from
+    :param user_id: id user
+    :return: int or None when the user does not exist
+    """
+    return User.all_objects.filter(pk=user_id).values_list('data_version', flat=True).first()
+
+
+def invalidate_user(user_id):
+    """
+    This function record that the data of a user changed after a write. The data version of the user, used for the
+    ETags and the keys of the cached responses, is increased in the same transaction. The row of the user stays locked
+    until the transaction ends, so the writes of a user get increasing versions in the order they commit.
+    :param user_id: id user
+    :return: new data version, stored in the version of the rows changed by the write
+    """
+    User.all_objects.filter(pk=user_id).update(data_version=F('data_version') + 1)
+
+    return data_version(user_id)
+
+
+def cache_user_response(name):
+    """
+    This decorator cache the 200 and 204 responses of a view that receives user_id, keyed by the user, its data
+    version and the full path of the request. The data version is read from the data base on every request, so a
+    write is seen by every process whatever the cache backend, and a lagging replica never gets a response built from
+    newer data than it has.
+    :param name: name of the view in the cache key
+    :return: decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, user_id, *args, **kwargs):
+            path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+            key = 'accounts:%s:%s:%s:%s' % (name, user_id, data_version(user_id), path)
+            cache = _cache()
+
+            cached = cache.get(key)
+            if cached is not None:
+                _count('hits')
+                return Response(cached[1], status=cached[0])
+
+            _count('misses')
+            response = view(request, user_id, *args, **kwargs)
+
+            if response.status_code in CACHEABLE_STATUS:
+                cache.set(key, (response.status_code, response.data), getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """
+    This function return the hit and miss counters of the cached responses in this process
+    :return: {hits, misses}
+    """
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from users.models import User
+
+
+def _etag(request, user_id, data_version):
+    key = '%s|%s|%s|%s' % (user_id, data_version, request.get_full_path(), request.META.get('HTTP_ACCEPT', ''))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def user_etag(request, user_id, *args, **kwargs):
+    """
+    This function compute the ETag of a view that receives user_id from the data version of the user, so a matching
+    If-None-Match is answered with one query on the user row and without running the view
+    :param request: petition
+    :param user_id: id user
+    :return: ETag or None when the user does not exist
+    """
+    data_version = User.all_objects.filter(pk=user_id).values_list('data_version', flat=True).first()
+
+    if data_version is None:
+        return None
+
+    return _etag(request, user_id, data_version)
+
+
+def owner_etag(model):
+    """
+    This function build the ETag function of a view that receives the id of a single row, computed from the data
+    version of the user that owns the row
+    :param model: model of the row
+    :return: function for django.views.decorators.http.condition
+    """
+    def etag(request, *args, **kwargs):
+        pk = args[0] if args else list(kwargs.values())[0]
+        owner = model.objects.filter(pk=pk).values_list('user_id', 'user__data_version').first()
+
+        if owner is None:
+            return None
+
+        return _etag(request, *owner)
+    return etag
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.archive import archivable, archive_movements, newest_movement_id
+from accounts.models import Movement
+
+
+class Command(BaseCommand):
+    help = 'Move the old soft deleted movements, and optionally the old active ones, to the archive in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=90,
+                            help='Days that a soft deleted movement stays in the hot table')
+        parser.add_argument('--older-than-years', type=int,
+                            help='Also archive the active movements dated more than this many years ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Movements moved per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count the movements without moving them')
+
+    def handle(self, *args, **options):
+        condition = archivable(options['retention_days'], options['older_than_years'])
+        candidates = Movement.all_objects.filter(condition).exclude(pk=newest_movement_id())
+
+        if options['dry_run']:
+            self.stdout.write('%d movements to archive' % candidates.count())
+            return
+
+        batch_size = options['batch_size']
+        archived = 0
+        last_id = 0
+
+        while True:
+            ids = list(candidates.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            archived += archive_movements(ids, condition)
+            self.stdout.write('%d movements archived' % archived)
+
+            if options['sleep']:
+                # Leaves room to the writers between the batches
+                time.sleep(options['sleep'])
+
+        self.stdout.write('%d movements archived' % archived)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from accounts.benchmark import ROUTES, build_context, disconnected_request_signals, measure, route_names
+from accounts.models import Category, Account, Movement
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Send requests to every route of the accounts and users api through the WSGI application and report '
+            'their latency percentiles, query counts and peak memory as JSON. Writes are rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per route')
+        parser.add_argument('--route', action='append', dest='routes', help='Only measure this url name')
+        parser.add_argument('--label', default='', help='Free text stored in the report, e.g. the commit')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+        parser.add_argument('--atomic-reads', action='store_true',
+                            help='Run the read endpoints in the request transaction (ATOMIC_READ_REQUESTS = True)')
+        parser.add_argument('--accept',
+                            help='Accept header of the requests, e.g. application/vnd.denarius.columns+json')
+
+    def handle(self, *args, **options):
+        from Denarius.wsgi import application
+
+        names = options['routes'] or route_names()
+        missing = [name for name in names if name not in ROUTES]
+        if missing:
+            raise CommandError('There is no benchmark request for %s' % ', '.join(missing))
+
+        report = {
+            'label': options['label'],
+            'date': datetime.now().isoformat(),
+            'iterations': options['iterations'],
+            'atomic_reads': options['atomic_reads'],
+            'accept': options['accept'],
+            'dataset': {
+                'users': User.all_objects.count(),
+                'categories': Category.all_objects.count(),
+                'accounts': Account.all_objects.count(),
+                'movements': Movement.all_objects.count(),
+            },
+            'routes': {},
+        }
+
+        headers = {'HTTP_ACCEPT': options['accept']} if options['accept'] else None
+
+        with disconnected_request_signals(), override_settings(ATOMIC_READ_REQUESTS=options['atomic_reads']), \
+                transaction.atomic():
+            try:
+                context = build_context()
+            except ValueError as error:
+                raise CommandError(error)
+            report['dataset']['user_movements'] = context.pop('movements')
+
+            for name in names:
+                method, path = ROUTES[name](context)[:2]
+                result = measure(application, lambda: ROUTES[name](context), options['iterations'], headers=headers)
+                report['routes'][name] = dict(result, method=method, path=path)
+                self.stderr.write('%-28s %s p50 %8.2f ms  p99 %8.2f ms  %3d queries' % (
+                    name, result['status'], result['p50_ms'], result['p99_ms'], result['queries']
+                ))
+
+            transaction.set_rollback(True)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        else:
+            self.stdout.write(output)
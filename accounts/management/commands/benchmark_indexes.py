@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Count
+
+from accounts.models import Category, Account, Movement
+from accounts.seeding import seed
+
+INDEX_MIGRATION = ('accounts', '0003_active_indexes')
+
+
+class Command(BaseCommand):
+    help = 'Show the plan and latency of the hot user-scoped queries, with and without the active indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-users', type=int, default=0,
+                            help='Seed this many users before measuring (100 users x 10000 movements = 1M rows)')
+        parser.add_argument('--movements', type=int, default=10000, help='Movements per seeded user')
+        parser.add_argument('--repeat', type=int, default=20, help='Executions per query')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also measure after dropping the active indexes, then create them again')
+
+    def handle(self, *args, **options):
+        if options['seed_users']:
+            seed(options['seed_users'], accounts=4, categories=12, movements=options['movements'],
+                 log=self.stdout.write)
+
+        busiest = Movement.all_objects.values('user_id').annotate(total=Count('id')).order_by('-total').first()
+        if not busiest:
+            self.stderr.write('There are no movements, use --seed-users')
+            return
+        self.stdout.write('%d movements, measuring user %d with %d movements' % (
+            Movement.all_objects.count(), busiest['user_id'], busiest['total']
+        ))
+
+        queries = [
+            ('movements page', Movement.objects.filter(user_id=busiest['user_id'])
+             .order_by('date', 'id')[:100]),
+            ('categories', Category.objects.filter(user_id=busiest['user_id']).order_by('name')),
+            ('accounts', Account.objects.filter(user_id=busiest['user_id']).order_by('name')),
+        ]
+
+        if options['compare']:
+            self.toggle_indexes(forwards=False)
+            try:
+                self.measure('without active indexes', queries, options['repeat'])
+            finally:
+                self.toggle_indexes(forwards=True)
+
+        self.measure('with active indexes', queries, options['repeat'])
+
+    def toggle_indexes(self, forwards):
+        loader = MigrationLoader(connection)
+        state = loader.project_state(INDEX_MIGRATION)
+        operations = loader.get_migration(*INDEX_MIGRATION).operations
+
+        with connection.schema_editor() as schema_editor:
+            for operation in operations:
+                if forwards:
+                    operation.database_forwards(INDEX_MIGRATION[0], schema_editor, state, state)
+                else:
+                    operation.database_backwards(INDEX_MIGRATION[0], schema_editor, state, state)
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def measure(self, title, queries, repeat):
+        self.stdout.write('\n== %s' % title)
+
+        for name, queryset in queries:
+            sql, params = queryset.query.sql_with_params()
+            explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+
+            with connection.cursor() as cursor:
+                cursor.execute(explain + sql, params)
+                plan = cursor.fetchall()
+
+            timings = sorted(timeit.repeat(lambda: list(queryset.all()), number=1, repeat=repeat))
+
+            self.stdout.write('-- %s: median %.2f ms, min %.2f ms' % (
+                name, timings[len(timings) // 2] * 1000, timings[0] * 1000
+            ))
+            for row in plan:
+                self.stdout.write('   %s' % ' | '.join('%s' % column for column in row))
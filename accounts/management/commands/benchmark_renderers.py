@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import resolve
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from accounts.benchmark import ROUTES, build_context
+from api.renderers import ColumnarRenderer
+
+LIST_ROUTES = ('api_view_all_movements', 'api_view_user_movements', 'api_view_all_categories',
+               'api_view_all_accounts', 'api_view_users')
+
+
+class Command(BaseCommand):
+    help = 'Compare the serialize time and the bytes per row of the json and the columnar renderers on a page of the ' \
+           'big list routes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000, help='Rows of the page rendered')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per renderer, the best one is reported')
+        parser.add_argument('--route', action='append', dest='routes', help='Only measure this url name')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        renderers = [('json', JSONRenderer()), ('columns', ColumnarRenderer())]
+
+        with transaction.atomic():
+            try:
+                context = build_context()
+            except ValueError as error:
+                raise CommandError(error)
+
+            for name in options['routes'] or LIST_ROUTES:
+                path, params = ROUTES[name](context)[1:3]
+                match = resolve(path)
+                response = match.func(factory.get(path, dict(params, page_size=options['page_size'])), *match.args,
+                                      **match.kwargs)
+                rows = max(len(value) for value in response.data.values() if isinstance(value, list))
+
+                for label, renderer in renderers:
+                    content = renderer.render(response.data)
+                    seconds = min(timeit.repeat(lambda: renderer.render(response.data), number=1,
+                                                repeat=options['repeat']))
+                    self.stdout.write('%-28s %-8s %5d rows %8.2f us/row %7.1f bytes/row %8.2f ms' % (
+                        name, label, rows, seconds * 1e6 / rows, len(content) / float(rows), seconds * 1000
+                    ))
+
+            transaction.set_rollback(True)
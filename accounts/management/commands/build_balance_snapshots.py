@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Account, Movement
+from accounts.snapshots import build_snapshots, last_complete_month_end, month_end
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the month end balance snapshots of every account, a batch of accounts at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Accounts rebuilt per transaction')
+        parser.add_argument('--until',
+                            help='A day of the last month to snapshot, YYYY-MM-DD (the previous month by default)')
+
+    def handle(self, *args, **options):
+        until = last_complete_month_end()
+        if options['until']:
+            try:
+                until = month_end(Movement._meta.get_field('date').to_python(options['until']))
+            except ValidationError:
+                raise CommandError('Invalid date: %s' % options['until'])
+
+        batch_size = options['batch_size']
+        accounts = snapshots = 0
+        last_id = 0
+
+        while True:
+            batch = list(Account.all_objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+
+            snapshots += build_snapshots(batch, until)
+            accounts += len(batch)
+
+        self.stdout.write('%d accounts, %d snapshots up to %s' % (accounts, snapshots, until))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from accounts.rollups import rebuild_rollups
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the monthly rollups of the movements, a batch of users at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Users rebuilt per transaction')
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only rebuild this user')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = rows = 0
+        last_id = 0
+
+        while True:
+            user_ids = User.all_objects.filter(pk__gt=last_id).order_by('pk')
+            if options['users']:
+                user_ids = user_ids.filter(pk__in=options['users'])
+            user_ids = list(user_ids.values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            rows += rebuild_rollups(user_ids)
+            users += len(user_ids)
+            self.stdout.write('%d users rebuilt' % users)
+
+        self.stdout.write('%d users rebuilt, %d rollup rows' % (users, rows))
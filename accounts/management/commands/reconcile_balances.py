@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+
+from accounts.balances import movement_totals
+from accounts.cache import invalidate_user
+from accounts.models import Account
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare the stored balance of every account with its initial money plus its movement history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Accounts checked per query')
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences without fixing them')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = fixed = 0
+        last_id = 0
+
+        using = router.db_for_write(Account)
+        while True:
+            batch = list(Account.all_objects.using(using).filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', 'user_id'
+            )[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            with transaction.atomic(using=using):
+                # Lock the users first, like the writes do through invalidate_user, then the accounts, and only read
+                # their balances once locked, so a movement written meanwhile can not be lost by the fix
+                list(User.all_objects.using(using).select_for_update().filter(
+                    pk__in={user_id for _, user_id in batch}
+                ).order_by('pk').values_list('pk', flat=True))
+                accounts = list(Account.all_objects.using(using).select_for_update().filter(
+                    pk__in=[account_id for account_id, _ in batch]
+                ).order_by('pk').values_list('pk', 'user_id', 'money', 'initial_money'))
+
+                totals = movement_totals([account_id for account_id, _, _, _ in accounts], using=using)
+
+                for account_id, user_id, money, initial_money in accounts:
+                    expected = initial_money + totals.get(account_id, 0)
+                    if money != expected:
+                        self.stdout.write('Account %d: stored %s, expected %s' % (account_id, money, expected))
+                        if not options['dry_run']:
+                            Account.all_objects.using(using).filter(pk=account_id).update(
+                                money=expected, version=invalidate_user(user_id)
+                            )
+                        fixed += 1
+
+            checked += len(accounts)
+
+        action = 'differ' if options['dry_run'] else 'fixed'
+        self.stdout.write('%d accounts checked, %d %s' % (checked, fixed, action))
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from accounts.seeding import seed
+
+
+class Command(BaseCommand):
+    help = 'Insert a synthetic dataset of users with accounts, categories and a movement history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users')
+        parser.add_argument('--accounts', type=int, default=4, help='Accounts per user')
+        parser.add_argument('--categories', type=int, default=12, help='Categories per user')
+        parser.add_argument('--movements', type=int, default=1000, help='Movements per user')
+        parser.add_argument('--days', type=int, default=3 * 365, help='Days of movement history')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same dataset')
+
+    def handle(self, *args, **options):
+        users = seed(options['users'], options['accounts'], options['categories'], options['movements'],
+                     days=options['days'], random_seed=options['seed'], log=self.stdout.write)
+
+        self.stdout.write('Seeded %d users with %d accounts, %d categories and %d movements each' % (
+            len(users), options['accounts'], options['categories'], options['movements']
+        ))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 11:27
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60, verbose_name='Nombre')),
+                ('description', models.TextField(verbose_name='Descripción')),
+                ('money', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Dinero')),
+                ('register_date', models.DateField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('delete_date', models.DateField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Es activa')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=60, verbose_name='Nombre')),
+                ('description', models.TextField(verbose_name='Descripción')),
+                ('register_date', models.DateField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('delete_date', models.DateField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Es activa')),
+                ('category_color', models.CharField(default='#216c2a', max_length=10, verbose_name='Color')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Movement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto')),
+                ('type', models.CharField(max_length=60, verbose_name='Tipo')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('concept', models.CharField(max_length=100, verbose_name='Concepto')),
+                ('account_transfer', models.IntegerField(blank=True, null=True)),
+                ('register_date', models.DateField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('delete_date', models.DateField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Es activa')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.Account')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.Category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
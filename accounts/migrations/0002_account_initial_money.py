@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 11:26
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+
+def fill_initial_money(apps, schema_editor):
+    # The balances were set by hand until now, the initial money is what is left after taking out the active
+    # movements, so reconcile_balances keeps them
+    Account = apps.get_model('accounts', 'Account')
+    Movement = apps.get_model('accounts', 'Movement')
+    alias = schema_editor.connection.alias
+    movements = Movement.objects.using(alias).filter(is_active=True)
+
+    totals = {}
+    for account_id, delta in movements.values('account_id').annotate(delta=Sum(Case(
+        When(account_transfer__isnull=False, then=F('amount') * -1),
+        When(type__iexact='ingreso', then=F('amount')),
+        When(Q(type__iexact='egreso') | Q(type__iexact='transferencia'), then=F('amount') * -1),
+        default=Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))).values_list('account_id', 'delta').order_by():
+        totals[account_id] = totals.get(account_id, 0) + (delta or 0)
+    for account_id, delta in movements.filter(account_transfer__isnull=False).values('account_transfer').annotate(
+        delta=Sum('amount')
+    ).values_list('account_transfer', 'delta').order_by():
+        totals[account_id] = totals.get(account_id, 0) + (delta or 0)
+
+    Account.objects.using(alias).update(initial_money=F('money'))
+    for account_id, delta in totals.items():
+        if delta:
+            Account.objects.using(alias).filter(pk=account_id).update(initial_money=F('money') - delta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='initial_money',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Dinero inicial'),
+        ),
+        migrations.RunPython(fill_initial_money, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from Denarius.indexes import AddActiveIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_account_initial_money'),
+    ]
+
+    operations = [
+        # view_user_categories: filter(user=..., is_active=True).order_by('name')
+        AddActiveIndex(
+            model_name='category', name='accounts_category_active_name', fields=['user', 'is_active', 'name']
+        ),
+        # view_user_accounts: filter(user=..., is_active=True).order_by('name')
+        AddActiveIndex(
+            model_name='account', name='accounts_account_active_name', fields=['user', 'is_active', 'name']
+        ),
+        # view_user_movements: filter(user=..., is_active=True).order_by('date', 'id')
+        AddActiveIndex(
+            model_name='movement', name='accounts_movement_active_date', fields=['user', 'is_active', 'date']
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 11:42
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from Denarius.indexes import AddActiveIndex, KeepIndexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_monthlyrollup'),
+    ]
+
+    operations = [
+        # SQLite rebuilds the table to alter the column, which drops the active index of 0003
+        KeepIndexes(
+            operations=[
+                migrations.AlterField(
+                    model_name='movement',
+                    name='account_transfer',
+                    field=models.IntegerField(blank=True, db_index=True, null=True),
+                ),
+            ],
+            indexes=[
+                AddActiveIndex(
+                    model_name='movement', name='accounts_movement_active_date', fields=['user', 'is_active', 'date']
+                ),
+            ],
+        ),
+    ]
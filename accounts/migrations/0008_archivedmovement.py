@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 11:54
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0007_active_managers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMovement',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Monto')),
+                ('type', models.CharField(max_length=60, verbose_name='Tipo')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('concept', models.CharField(max_length=100, verbose_name='Concepto')),
+                ('account_transfer', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('register_date', models.DateField(verbose_name='Fecha de registro')),
+                ('delete_date', models.DateField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Es activa')),
+                ('archive_date', models.DateField(auto_now_add=True, verbose_name='Fecha de archivo')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.Account')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.Category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'default_manager_name': 'all_objects',
+            },
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedmovement',
+            index_together=set([('user', 'date'), ('account', 'date')]),
+        ),
+    ]
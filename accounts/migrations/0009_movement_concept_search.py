@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from Denarius.indexes import AddFullTextIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_archivedmovement'),
+    ]
+
+    operations = [
+        # search_movements: words of the concept of the movements of a user
+        AddFullTextIndex(model_name='movement', name='accounts_movement_concept_fts', field='concept', scope='user'),
+    ]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 12:06
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+from Denarius.indexes import AddActiveIndex, AddFullTextIndex, KeepIndexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0009_movement_concept_search'),
+    ]
+
+    operations = [
+        # SQLite rebuilds these tables to add the column, which drops the indexes that are not in the model state
+        KeepIndexes(
+            operations=[
+                migrations.AddField(
+                    model_name='account',
+                    name='version',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+                ),
+                migrations.AddField(
+                    model_name='category',
+                    name='version',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+                ),
+                migrations.AddField(
+                    model_name='movement',
+                    name='version',
+                    field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+                ),
+            ],
+            indexes=[
+                AddActiveIndex(
+                    model_name='category', name='accounts_category_active_name', fields=['user', 'is_active', 'name']
+                ),
+                AddActiveIndex(
+                    model_name='account', name='accounts_account_active_name', fields=['user', 'is_active', 'name']
+                ),
+                AddActiveIndex(
+                    model_name='movement', name='accounts_movement_active_date', fields=['user', 'is_active', 'date']
+                ),
+                AddFullTextIndex(
+                    model_name='movement', name='accounts_movement_concept_fts', field='concept', scope='user'
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedmovement',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versión'),
+        ),
+        migrations.AlterIndexTogether(
+            name='account',
+            index_together=set([('user', 'version')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedmovement',
+            index_together=set([('account', 'date'), ('user', 'date'), ('user', 'version')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='category',
+            index_together=set([('user', 'version')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='movement',
+            index_together=set([('user', 'version')]),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+from Denarius.indexes import AddActiveIndex
+
+
+class Migration(migrations.Migration):
+    """
+    Rebuilds the indexes of 0003 as composite indexes, the partial ones it created on PostgreSQL and SQLite are not used
+    by the queries of the ORM, which bind is_active as a parameter.
+    """
+
+    dependencies = [
+        ('accounts', '0010_change_versions'),
+    ]
+
+    operations = [
+        AddActiveIndex(
+            model_name='category', name='accounts_category_active_name', fields=['user', 'is_active', 'name'],
+            replace=True
+        ),
+        AddActiveIndex(
+            model_name='account', name='accounts_account_active_name', fields=['user', 'is_active', 'name'],
+            replace=True
+        ),
+        AddActiveIndex(
+            model_name='movement', name='accounts_movement_active_date', fields=['user', 'is_active', 'date'],
+            replace=True
+        ),
+    ]
@@ -6,6 +6,7 @@ from django.utils.translation import ugettext_lazy as _
 
 
 # Create your models here.
+from Denarius.managers import ActiveManager
 from users.models import User
 
 
@@ -17,6 +18,16 @@ class Category(models.Model):
     delete_date = models.DateField(_('Fecha de eliminación'), blank=True, null=True)
     is_active = models.BooleanField(_('Es activa'), default=True)
     category_color = models.CharField(_('Color'), max_length=10, default='#216c2a')
+    # data_version of the user in the write that last changed the row, see accounts.sync
+    version = models.PositiveIntegerField(_('Versión'), default=0)
+
+    # Only the active rows; all_objects also has the soft deleted ones
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        index_together = [('user', 'version')]
 
 
 class Account(models.Model):
@@ -24,9 +35,19 @@ class Account(models.Model):
     name = models.CharField(_('Nombre'), max_length=60)
     description = models.TextField(_('Descripción'))
     money = models.DecimalField(_('Dinero'), max_digits=12, decimal_places=2)
+    initial_money = models.DecimalField(_('Dinero inicial'), max_digits=12, decimal_places=2, default=0)
     register_date = models.DateField(_('Fecha de registro'), auto_now_add=True)
     delete_date = models.DateField(_('Fecha de eliminación'), blank=True, null=True)
     is_active = models.BooleanField(_('Es activa'), default=True)
+    version = models.PositiveIntegerField(_('Versión'), default=0)
+
+    # Only the active rows; all_objects also has the soft deleted ones
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        index_together = [('user', 'version')]
 
 
 class Movement(models.Model):
@@ -37,7 +58,64 @@ class Movement(models.Model):
     type = models.CharField(_('Tipo'), max_length=60)
     date = models.DateField(_('Fecha'))
     concept = models.CharField(_('Concepto'), max_length=100)
-    account_transfer = models.IntegerField(blank=True, null=True)
+    account_transfer = models.IntegerField(blank=True, null=True, db_index=True)
     register_date = models.DateField(_('Fecha de registro'), auto_now_add=True)
     delete_date = models.DateField(_('Fecha de eliminación'), blank=True, null=True)
     is_active = models.BooleanField(_('Es activa'), default=True)
+    version = models.PositiveIntegerField(_('Versión'), default=0)
+
+    # Only the active rows; all_objects also has the soft deleted ones
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        index_together = [('user', 'version')]
+
+
+class MonthlyRollup(models.Model):
+    user = models.ForeignKey(User)
+    account = models.ForeignKey(Account)
+    category = models.ForeignKey(Category)
+    type = models.CharField(_('Tipo'), max_length=60)
+    month = models.DateField(_('Mes'))
+    amount = models.DecimalField(_('Monto'), max_digits=16, decimal_places=2, default=0)
+    movements = models.IntegerField(_('Movimientos'), default=0)
+
+    class Meta:
+        unique_together = ('user', 'month', 'account', 'category', 'type')
+
+
+class BalanceSnapshot(models.Model):
+    account = models.ForeignKey(Account)
+    date = models.DateField(_('Fecha'))
+    balance = models.DecimalField(_('Saldo'), max_digits=12, decimal_places=2)
+
+    class Meta:
+        unique_together = ('account', 'date')
+
+
+class ArchivedMovement(models.Model):
+    # Keeps the id the movement had in the hot table, which is never reused, see archive.newest_movement_id
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(User)
+    category = models.ForeignKey(Category)
+    account = models.ForeignKey(Account)
+    amount = models.DecimalField(_('Monto'), max_digits=12, decimal_places=2)
+    type = models.CharField(_('Tipo'), max_length=60)
+    date = models.DateField(_('Fecha'))
+    concept = models.CharField(_('Concepto'), max_length=100)
+    account_transfer = models.IntegerField(blank=True, null=True, db_index=True)
+    register_date = models.DateField(_('Fecha de registro'))
+    delete_date = models.DateField(_('Fecha de eliminación'), blank=True, null=True)
+    is_active = models.BooleanField(_('Es activa'), default=True)
+    version = models.PositiveIntegerField(_('Versión'), default=0)
+    archive_date = models.DateField(_('Fecha de archivo'), auto_now_add=True)
+
+    # Only the active rows; all_objects also has the soft deleted ones
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        index_together = [('user', 'date'), ('account', 'date'), ('user', 'version')]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from accounts.archive import movement_sources
+from accounts.balances import to_amount
+from accounts.models import Movement, MonthlyRollup
+
+
+def _key(movement):
+    day = Movement._meta.get_field('date').to_python(movement.date)
+    return movement.user_id, movement.account_id, movement.category_id, movement.type, day.replace(day=1)
+
+
+def add_to_rollups(movements, sign=1):
+    """
+    This function add active movements to the monthly rollups of their user, or remove them with sign -1, with one
+    in place UPDATE per rollup row and an INSERT for the rows that do not exist yet. It must run in the transaction
+    that writes the movements.
+    :param movements: iterable of Movement as they were when they were applied
+    :param sign: 1 to add the movements, -1 to remove them
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for movement in movements:
+        row = totals[_key(movement)]
+        row[0] += sign * to_amount(movement.amount)
+        row[1] += sign
+
+    for (user_id, account_id, category_id, movement_type, month), (amount, count) in totals.items():
+        rollup = MonthlyRollup.objects.filter(user_id=user_id, account_id=account_id, category_id=category_id,
+                                              type=movement_type, month=month)
+        if rollup.update(amount=F('amount') + amount, movements=F('movements') + count):
+            continue
+
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.create(user_id=user_id, account_id=account_id, category_id=category_id,
+                                             type=movement_type, month=month, amount=amount, movements=count)
+        except IntegrityError:
+            # A concurrent transaction inserted the row first
+            rollup.update(amount=F('amount') + amount, movements=F('movements') + count)
+
+
+def rebuild_rollups(user_ids):
+    """
+    This function regenerate the monthly rollups of some users from their active movements, including the archived
+    ones
+    :param user_ids: list of id users
+    :return: number of rollup rows created
+    """
+    totals = defaultdict(lambda: [0, 0])
+
+    for movements in movement_sources():
+        rows = movements.filter(user_id__in=user_ids).annotate(
+            month=TruncMonth('date')
+        ).values('user_id', 'account_id', 'category_id', 'type', 'month').annotate(
+            total=Sum('amount'), count=Count('id')
+        ).order_by()
+
+        for row in rows:
+            key = (row['user_id'], row['account_id'], row['category_id'], row['type'], row['month'])
+            totals[key][0] += row['total']
+            totals[key][1] += row['count']
+
+    with transaction.atomic():
+        MonthlyRollup.objects.filter(user_id__in=user_ids).delete()
+        rollups = MonthlyRollup.objects.bulk_create([MonthlyRollup(
+            user_id=user_id, account_id=account_id, category_id=category_id, type=movement_type, month=month,
+            amount=amount, movements=count
+        ) for (user_id, account_id, category_id, movement_type, month), (amount, count) in totals.items()])
+
+    return len(rollups)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+
+from django.conf import settings
+
+from accounts.balances import read_connection
+from accounts.models import Movement
+
+# FTS5 table of the concept and user on SQLite and FULLTEXT index of the concept on MySQL, from the migration 0009
+INDEX_NAME = 'accounts_movement_concept_fts'
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+_backends = {}
+
+
+def search_backend(connection):
+    """
+    This function tell how a connection searches the concepts of the movements: 'fts5' on SQLite with the FTS5 table,
+    'fulltext' on MySQL or None to fall back to LIKE. The answer is kept for the life of the process.
+    :param connection: connection
+    :return: str or None
+    """
+    if connection.alias not in _backends:
+        backend = None
+        if connection.vendor == 'mysql':
+            backend = 'fulltext'
+        elif connection.vendor == 'sqlite' and INDEX_NAME in connection.introspection.table_names():
+            backend = 'fts5'
+        _backends[connection.alias] = backend
+
+    return _backends[connection.alias]
+
+
+def search_words(text):
+    """
+    This function split the text typed by the user in the words to search, dropping the operators of the full text
+    query languages
+    :param text: str
+    :return: list of words
+    """
+    return WORD.findall(text.lower())
+
+
+def search_concepts(user_id, words, start=None, end=None, account_id=None, after=None, limit=100):
+    """
+    This function return the active movements of a user whose concept has every word, or a word starting with it,
+    most relevant first and the newest first among equally relevant ones
+    :param user_id: id user
+    :param words: list from search_words, not empty
+    :param start: first date included (optional)
+    :param end: last date included (optional)
+    :param account_id: id account (optional)
+    :param after: (score, id movement) of the last movement of the previous page (optional)
+    :param limit: maximum number of movements
+    :return: list of (id movement, score)
+    """
+    connection = read_connection()
+    backend = search_backend(connection)
+
+    short_words = []
+    if backend == 'fulltext':
+        # Words shorter than innodb_ft_min_token_size are not in the FULLTEXT index, requiring them with + would match
+        # nothing: they are checked with LIKE, and without any longer word the search is the LIKE one
+        min_length = getattr(settings, 'SEARCH_MIN_WORD_LENGTH', 3)
+        short_words = [word for word in words if len(word) < min_length]
+        words = [word for word in words if len(word) >= min_length]
+        if not words:
+            backend, words = None, short_words
+
+    if backend is None:
+        movements = Movement.objects.using(connection.alias).filter(user_id=user_id)
+        for word in words:
+            movements = movements.filter(concept__icontains=word)
+        if start:
+            movements = movements.filter(date__gte=start)
+        if end:
+            movements = movements.filter(date__lte=end)
+        if account_id:
+            movements = movements.filter(account_id=account_id)
+        if after:
+            movements = movements.filter(pk__lt=after[1])
+        # Without an index every movement is equally relevant
+        return [(pk, 0.0) for pk in movements.order_by('-pk').values_list('pk', flat=True)[:limit]]
+
+    quote = connection.ops.quote_name
+    table = quote(Movement._meta.db_table)
+
+    def column(name):
+        return '%s.%s' % (table, quote(Movement._meta.get_field(name).column))
+
+    if backend == 'fts5':
+        fts = quote(INDEX_NAME)
+        source = '%s JOIN %s ON %s = %s.rowid' % (fts, table, column('id'), fts)
+        # The user is indexed too, so the index only reads the rows of the user. rank is the bm25 of the row, lower
+        # is more relevant
+        score, score_params = '-%s.rank' % fts, []
+        match = ['%s : "%s"' % (quote(Movement._meta.get_field('user').column), user_id)]
+        match += ['%s : "%s"*' % (quote(Movement._meta.get_field('concept').column), word) for word in words]
+        conditions = [('%s MATCH %%s' % fts, [' AND '.join(match)])]
+    else:
+        source = table
+        # The index only has the concept, so MySQL scores the matches of every user before the user filter below
+        score = 'MATCH (%s) AGAINST (%%s IN BOOLEAN MODE)' % column('concept')
+        score_params = [' '.join('+%s*' % word for word in words)]
+        conditions = [('%s > 0' % score, score_params)]
+        conditions += [('%s LIKE %%s' % column('concept'), ['%%%s%%' % connection.ops.prep_for_like_query(word)])
+                       for word in short_words]
+
+    conditions.append(('%s = %%s' % column('user'), [user_id]))
+    conditions.append(('%s = %%s' % column('is_active'), [True]))
+    if start:
+        conditions.append(('%s >= %%s' % column('date'), [start]))
+    if end:
+        conditions.append(('%s <= %%s' % column('date'), [end]))
+    if account_id:
+        conditions.append(('%s = %%s' % column('account'), [account_id]))
+    if after:
+        conditions.append(('(%s < %%s OR (%s = %%s AND %s < %%s))' % (score, score, column('id')),
+                           score_params + [after[0]] + score_params + [after[0], after[1]]))
+
+    sql = 'SELECT %s, %s AS score FROM %s WHERE %s ORDER BY score DESC, %s DESC LIMIT %d' % (
+        column('id'), score, source, ' AND '.join(condition for condition, _ in conditions), column('id'), limit
+    )
+    params = score_params + [param for _, condition_params in conditions for param in condition_params]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(pk, float(score)) for pk, score in cursor]
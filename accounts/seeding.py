@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from Denarius.Enums import MovementTypes
+from accounts.balances import movement_deltas
+from accounts.models import Category, Account, Movement
+from accounts.rollups import rebuild_rollups
+from users.models import User
+
+CATEGORIES = ['Comida', 'Transporte', 'Renta', 'Servicios', 'Salud', 'Ropa', 'Entretenimiento', 'Educación',
+              'Regalos', 'Viajes', 'Sueldo', 'Ahorro']
+ACCOUNTS = ['Efectivo', 'Débito', 'Crédito', 'Ahorro', 'Inversión']
+CONCEPTS = ['Supermercado', 'Gasolina', 'Pago de renta', 'Recibo de luz', 'Farmacia', 'Cine', 'Colegiatura',
+            'Restaurante', 'Nómina quincenal', 'Transferencia a ahorro', 'Café', 'Taxi', 'Internet', 'Teléfono']
+
+
+def seed(users, accounts, categories, movements, days=3 * 365, random_seed=0, batch_size=5000, log=None):
+    """
+    This function insert a synthetic dataset: users, each one with its accounts, categories and a movement history
+    spread over the last days. Movements go through bulk inserts and the balances and monthly rollups are set to
+    match them.
+    :param users: number of users
+    :param accounts: accounts per user
+    :param categories: categories per user
+    :param movements: movements per user
+    :param days: length of the movement history
+    :param random_seed: seed of the generator, the same seed gives the same dataset
+    :param batch_size: rows per insert
+    :param log: function called with progress messages (optional)
+    :return: list of the created users
+    """
+    generator = random.Random(random_seed)
+    first = (User.all_objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+    today = date.today()
+    password = make_password(None)
+
+    created = User.objects.bulk_create([
+        User(nickname='seed%d' % number, full_name='Usuario %d' % number, email='seed%d@denarius.mx' % number,
+             password=password)
+        for number in range(first, first + users)
+    ], batch_size=batch_size)
+    created = list(User.all_objects.filter(nickname__in=[user.nickname for user in created]).order_by('pk'))
+
+    for position, user in enumerate(created):
+        with transaction.atomic():
+            Category.objects.bulk_create([
+                Category(user=user, name=CATEGORIES[index % len(CATEGORIES)], description='Categoría %d' % index,
+                         category_color='#%06x' % generator.randrange(0x1000000))
+                for index in range(categories)
+            ])
+            Account.objects.bulk_create([
+                Account(user=user, name=ACCOUNTS[index % len(ACCOUNTS)], description='Cuenta %d' % index,
+                        money=Decimal('10000.00'), initial_money=Decimal('10000.00'))
+                for index in range(accounts)
+            ])
+            category_ids = list(Category.objects.filter(user=user).values_list('pk', flat=True))
+            account_ids = list(Account.objects.filter(user=user).values_list('pk', flat=True))
+
+            balances = defaultdict(int)
+            batch = []
+            for index in range(movements):
+                account_id = generator.choice(account_ids)
+                movement_type = generator.choice([MovementTypes.Income] + [MovementTypes.Expense] * 4 +
+                                                 [MovementTypes.Transfer])
+                transfer = None
+                if movement_type == MovementTypes.Transfer and len(account_ids) > 1:
+                    transfer = generator.choice([pk for pk in account_ids if pk != account_id])
+
+                movement_date = today - timedelta(days=generator.randrange(days))
+                is_active = generator.random() > 0.05
+                movement = Movement(
+                    user_id=user.pk, category_id=generator.choice(category_ids), account_id=account_id,
+                    amount=Decimal(generator.randrange(100, 500000)) / 100, type=movement_type, date=movement_date,
+                    concept=generator.choice(CONCEPTS), account_transfer=transfer, is_active=is_active,
+                    delete_date=None if is_active else movement_date,
+                )
+                if movement.is_active:
+                    for account, delta in movement_deltas(movement):
+                        balances[account] += delta
+                batch.append(movement)
+
+                if len(batch) == batch_size:
+                    Movement.objects.bulk_create(batch)
+                    batch = []
+            Movement.objects.bulk_create(batch)
+
+            for account_id, delta in balances.items():
+                Account.objects.filter(pk=account_id).update(money=Decimal('10000.00') + delta)
+            rebuild_rollups([user.pk])
+
+        if log and (position + 1) % 10 == 0:
+            log('%d/%d users seeded' % (position + 1, users))
+
+    return created
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from accounts.balances import deltas_sql, read_connection, to_decimal
+from accounts.models import Movement
+
+_window_functions = {}
+
+
+def supports_window_functions(connection):
+    """
+    This function tell if the data base of a connection can run SUM() OVER (...), the answer is kept for the life of
+    the process
+    :param connection: connection
+    :return: bool
+    """
+    if connection.alias not in _window_functions:
+        supported = False
+        if connection.vendor == 'postgresql':
+            supported = True
+        elif connection.vendor == 'sqlite':
+            supported = connection.Database.sqlite_version_info >= (3, 25, 0)
+        elif connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT VERSION()')
+                mariadb = 'mariadb' in cursor.fetchone()[0].lower()
+            supported = connection.mysql_version >= ((10, 2) if mariadb else (8, 0))
+        _window_functions[connection.alias] = supported
+
+    return _window_functions[connection.alias]
+
+
+def cumulative_changes(account_ids, end):
+    """
+    This function return the balance change of every account accumulated up to each day with movements, with a
+    window function when the data base has them and otherwise adding the daily changes in a single pass
+    :param account_ids: list of id accounts
+    :param end: last date included or None
+    :return: iterator of (id account, date, cumulative change) ordered by account and date
+    """
+    filters = {'date__lte': end} if end else {}
+    connection = read_connection()
+    sql, params = deltas_sql(connection, account_ids, ('date',), **filters)
+
+    if supports_window_functions(connection):
+        sql = 'SELECT account_id, date, SUM(SUM(delta)) OVER (PARTITION BY account_id ORDER BY date) ' \
+              'FROM (%s) deltas GROUP BY account_id, date ORDER BY account_id, date' % sql
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for account_id, day, total in cursor:
+                yield account_id, day, total
+        return
+
+    sql = 'SELECT account_id, date, SUM(delta) FROM (%s) deltas GROUP BY account_id, date ' \
+          'ORDER BY account_id, date' % sql
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        current, total = None, 0
+        for account_id, day, delta in cursor:
+            if account_id != current:
+                current, total = account_id, 0
+            total += delta
+            yield account_id, day, total
+
+
+def _to_date(value):
+    return Movement._meta.get_field('date').to_python(value)
+
+
+def downsample(points, size):
+    """
+    This function reduce a series to at most size points, keeping the last point of each of size equal slices so the
+    final balance is always kept
+    :param points: list
+    :param size: maximum number of points, None or 0 keeps all of them
+    :return: list
+    """
+    if not size or len(points) <= size:
+        return points
+    return [points[-(-(index + 1) * len(points) // size) - 1] for index in range(size)]
+
+
+def balance_series(accounts, start=None, end=None, size=None):
+    """
+    This function compute the balance of some accounts at the end of every day with movements in a range. The
+    balance is the initial money of the account plus its active movements up to that day.
+    :param accounts: list of Account with pk, name and initial_money
+    :param start: first date included (optional)
+    :param end: last date included (optional)
+    :param size: maximum points per account, downsampled when there are more (optional)
+    :return: [{account, name, opening, points: [{date, balance}]}] where opening is the balance before start
+    """
+    initial = {account.pk: account.initial_money for account in accounts}
+    series = OrderedDict((account.pk, {
+        'account': account.pk, 'name': account.name, 'opening': account.initial_money, 'points': [],
+    }) for account in accounts)
+
+    for account_id, day, total in cumulative_changes(list(series), end):
+        day = _to_date(day)
+        balance = initial[account_id] + to_decimal(total)
+
+        if start and day < start:
+            series[account_id]['opening'] = balance
+        else:
+            series[account_id]['points'].append({'date': day, 'balance': balance})
+
+    for row in series.values():
+        row['points'] = downsample(row['points'], size)
+
+    return list(series.values())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from calendar import monthrange
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+
+from accounts.balances import movement_deltas, movement_totals, to_decimal
+from accounts.models import Account, BalanceSnapshot, Movement
+from accounts.series import cumulative_changes
+
+
+def _to_date(value):
+    return Movement._meta.get_field('date').to_python(value)
+
+
+def month_end(day):
+    """
+    This function return the last day of the month of a date
+    :param day: date
+    :return: date
+    """
+    return day.replace(day=monthrange(day.year, day.month)[1])
+
+
+def last_complete_month_end(today=None):
+    """
+    This function return the end of the month before the current one, the last month that can not change anymore
+    with movements of today
+    :param today: date (optional)
+    :return: date
+    """
+    return (today or date.today()).replace(day=1) - timedelta(days=1)
+
+
+def build_snapshots(account_ids, until):
+    """
+    This function regenerate the month end balances of some accounts, from the month of their first active movement
+    up to a date, replacing the snapshots they had. The accounts stay locked from before the movements are read until
+    the snapshots are saved. A movement write updates the balance of its accounts before it calls
+    invalidate_snapshots, so it either commits before the movements are read or waits and then deletes the snapshots
+    that miss it.
+    :param account_ids: list of id accounts
+    :param until: last month end included
+    :return: number of snapshots created
+    """
+    with transaction.atomic():
+        initial = dict(Account.all_objects.select_for_update().filter(pk__in=account_ids).order_by('pk').values_list(
+            'pk', 'initial_money'
+        ))
+        snapshots = []
+
+        for account_id, rows in groupby(cumulative_changes(list(initial), until), key=itemgetter(0)):
+            total = 0
+            boundary = None
+            for _, day, change in rows:
+                day = _to_date(day)
+                # Close every month that ended before this movement with the balance it had
+                while boundary is not None and boundary < day:
+                    snapshots.append(BalanceSnapshot(account_id=account_id, date=boundary,
+                                                     balance=initial[account_id] + total))
+                    boundary = month_end(boundary + timedelta(days=1))
+                if boundary is None:
+                    boundary = month_end(day)
+                total = to_decimal(change)
+
+            while boundary is not None and boundary <= until:
+                snapshots.append(BalanceSnapshot(account_id=account_id, date=boundary,
+                                                 balance=initial[account_id] + total))
+                boundary = month_end(boundary + timedelta(days=1))
+
+        BalanceSnapshot.objects.filter(account_id__in=list(initial)).delete()
+        BalanceSnapshot.objects.bulk_create(snapshots)
+
+    return len(snapshots)
+
+
+def balance_on(account, day):
+    """
+    This function return the balance of an account at the end of a day, from the last snapshot before it plus the
+    active movements since then
+    :param account: Account with pk and initial_money
+    :param day: date
+    :return: Decimal
+    """
+    snapshot = BalanceSnapshot.objects.filter(account_id=account.pk, date__lte=day).order_by('-date').values_list(
+        'date', 'balance'
+    ).first()
+    after, balance = snapshot or (None, account.initial_money)
+
+    return balance + movement_totals([account.pk], after=after, until=day).get(account.pk, 0)
+
+
+def invalidate_snapshots(movements):
+    """
+    This function delete the snapshots that include movements being written, from the date of the earliest of them
+    on, for every account whose balance they change. Earlier snapshots stay valid.
+    :param movements: iterable of Movement as they were when they were applied
+    """
+    since = {}
+    for movement in movements:
+        day = _to_date(movement.date)
+        for account_id, _ in movement_deltas(movement):
+            since[account_id] = min(day, since.get(account_id, day))
+
+    for account_id, day in since.items():
+        BalanceSnapshot.objects.filter(account_id=account_id, date__gte=day).delete()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncYear
+
+from accounts.archive import movement_sources
+from accounts.models import MonthlyRollup
+
+PERIODS = ('day', 'week', 'month', 'year')
+
+# Name in the result: field of Movement
+GROUPS = OrderedDict([
+    ('category', 'category_id'),
+    ('account', 'account_id'),
+    ('type', 'type'),
+])
+
+_TRUNCATE = {
+    'day': TruncDay,
+    # The backends of Django 1.11 can not truncate to weeks, the days are folded into weeks after the query
+    'week': TruncDay,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+def _from_rollups(period, start, end):
+    # The monthly rollups can answer whole months and years
+    return period in ('month', 'year') and (start is None or start.day == 1) and \
+        (end is None or (end + timedelta(days=1)).day == 1)
+
+
+def movement_summary(user_id, period, group, start=None, end=None):
+    """
+    This function add up the active movements of a user, archived ones included, per period and group with aggregate
+    queries. Months and years that are not cut by the range are read from the monthly rollups instead of the movements.
+    :param user_id: id user
+    :param period: day, week (starting on monday), month or year
+    :param group: list of names from GROUPS, can be empty
+    :param start: first date included (optional)
+    :param end: last date included (optional)
+    :return: [{period, <group>..., total, count}] ordered by period
+    """
+    fields = [GROUPS[name] for name in group]
+
+    if _from_rollups(period, start, end):
+        rows = MonthlyRollup.objects.filter(user_id=user_id, movements__gt=0)
+        if start:
+            rows = rows.filter(month__gte=start)
+        if end:
+            rows = rows.filter(month__lte=end)
+        rows = rows.annotate(period=F('month') if period == 'month' else TruncYear('month')).values(
+            'period', *fields
+        ).annotate(total=Sum('amount'), count=Sum('movements')).order_by()
+    else:
+        rows = []
+        for movements in movement_sources():
+            movements = movements.filter(user_id=user_id)
+            if start:
+                movements = movements.filter(date__gte=start)
+            if end:
+                movements = movements.filter(date__lte=end)
+            rows.extend(movements.annotate(period=_TRUNCATE[period]('date')).values('period', *fields).annotate(
+                total=Sum('amount'), count=Count('id')
+            ).order_by())
+
+    summary = OrderedDict()
+    for row in rows:
+        start_of_period = row['period']
+        if period == 'week':
+            start_of_period -= timedelta(days=start_of_period.weekday())
+
+        key = (start_of_period,) + tuple(row[field] for field in fields)
+        if key in summary:
+            summary[key]['total'] += row['total']
+            summary[key]['count'] += row['count']
+        else:
+            summary[key] = dict({'period': start_of_period, 'total': row['total'], 'count': row['count']},
+                                **{name: row[field] for name, field in zip(group, fields)})
+
+    return [summary[key] for key in sorted(summary)]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from accounts.models import Category, Account, Movement, ArchivedMovement
+from users.models import User
+
+# Name in the result: (model, fields sent to the client)
+SYNCED = OrderedDict([
+    ('categories', (Category, ('id', 'name', 'description', 'category_color'))),
+    ('accounts', (Account, ('id', 'name', 'description', 'money'))),
+    ('movements', (Movement, ('id', 'category_id', 'account_id', 'amount', 'type', 'date', 'concept',
+                              'account_transfer'))),
+])
+
+
+def changes_since(user_id, since=None):
+    """
+    This function return what changed in the categories, accounts and movements of a user after a data version. Every
+    write stores the data version of the user in the rows it changes, so the changes are the rows with a greater
+    version, read with the (user, version) indexes. The rows are bounded by the data version read first, a row written
+    meanwhile is left for the next sync.
+    :param user_id: id user
+    :param since: data version of the last sync of the client, None for a full sync
+    :return: {version, full, categories, accounts, movements, deleted: {categories, accounts, movements}} where the
+             lists have the active rows as dicts and deleted has the ids of the rows soft deleted since then
+    :raise User.DoesNotExist: the user does not exist
+    """
+    version = User.all_objects.filter(pk=user_id).values_list('data_version', flat=True).first()
+    if version is None:
+        raise User.DoesNotExist
+
+    # A version the server never reached, e.g. after restoring a backup, can not be trusted
+    full = since is None or since > version
+    changes = OrderedDict([('version', version), ('full', full)])
+    deleted = OrderedDict()
+
+    for name, (model, fields) in SYNCED.items():
+        rows = model.all_objects.filter(user_id=user_id, version__lte=version).order_by('id')
+
+        if full:
+            changes[name] = list(rows.filter(is_active=True).values(*fields))
+        else:
+            changes[name], deleted[name] = [], []
+            for row in rows.filter(version__gt=since).values('is_active', *fields):
+                if row.pop('is_active'):
+                    changes[name].append(row)
+                else:
+                    deleted[name].append(row['id'])
+
+    if not full:
+        # A soft deleted movement may have reached the archive before the client synced
+        deleted['movements'] += ArchivedMovement.all_objects.filter(
+            user_id=user_id, is_active=False, version__gt=since, version__lte=version
+        ).values_list('id', flat=True)
+
+    changes['deleted'] = deleted
+    return changes
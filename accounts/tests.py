@@ -1,6 +1,1117 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.test import TestCase
+import json
+import time
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection, connections, router
+from django.db.models import F
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils.six import StringIO
+
+from Denarius.middleware import ReplicaRoutingMiddleware
+from Denarius.routers import read_from_replicas, reading_from_replicas
+from accounts.balances import movement_totals
+from accounts.benchmark import route_names
+from accounts.cache import cache_stats
+from accounts.models import Category, Account, Movement, MonthlyRollup, BalanceSnapshot, ArchivedMovement
+from accounts.rollups import rebuild_rollups
+from accounts.search import _backends, search_backend, search_concepts
+from accounts.series import _window_functions, cumulative_changes
+from api.pagination import encode_cursor
+from api.renderers import COLUMNS_MEDIA_TYPE
+from users.models import User
+
+
+class AccountsApiTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(nickname='ricardo', full_name='Ricardo Pizano', email='ricardo@denarius.mx')
+        self.category = Category.objects.create(user=self.user, name='Comida', description='Comida del mes')
+        self.account = Account.objects.create(user=self.user, name='Efectivo', description='Cartera',
+                                              money=Decimal('1000.00'), initial_money=Decimal('1000.00'))
+
+    def create_movements(self, total, user=None):
+        user = user or self.user
+        category = Category.objects.create(user=user, name='Categoria', description='')
+        account = Account.objects.create(user=user, name='Cuenta', description='', money=Decimal('0'))
+        Movement.objects.bulk_create([
+            Movement(user=user, category=category, account=account, amount=Decimal('10.00'), type='egreso',
+                     date=date(2018, 1, 1 + index % 28), concept='Movimiento %d' % index)
+            for index in range(total)
+        ])
+
+
+class QueryCountTest(AccountsApiTestCase):
+    """
+    The listing endpoints must load their rows in a fixed number of queries, no matter how many rows exist.
+    The reads run outside of the ATOMIC_REQUESTS transaction; counts include the data version read for the ETag
+    """
+
+    def assert_constant_queries(self, url, queries):
+        for _ in range(2):
+            self.create_movements(5, user=User.objects.create(nickname='n%d' % User.objects.count(),
+                                                              email='%d@denarius.mx' % User.objects.count()))
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_atomic_read_requests(self):
+        # The savepoint and release of the request transaction come back
+        with self.settings(ATOMIC_READ_REQUESTS=True), self.assertNumQueries(3):
+            self.client.get(reverse('api_view_all_categories'))
+
+    def test_view_all_categories(self):
+        self.assert_constant_queries(reverse('api_view_all_categories'), 1)
+
+    def test_view_all_accounts(self):
+        self.assert_constant_queries(reverse('api_view_all_accounts'), 1)
+
+    def test_view_all_movements(self):
+        self.assert_constant_queries(reverse('api_view_all_movements'), 1)
+
+    def test_view_user_movements(self):
+        for total in (1, 10):
+            self.create_movements(total)
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('api_view_user_movements', args=[self.user.pk]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_view_single_movement(self):
+        self.create_movements(1)
+        movement = Movement.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api_view_single_movement', args=[movement.pk]))
+        self.assertEqual(response.data['movement']['category'], 'Categoria')
+        self.assertEqual(response.data['movement']['account'], 'Cuenta')
+
+
+class PaginationTest(AccountsApiTestCase):
+
+    def walk(self, url, key):
+        rows, cursor = [], None
+        while True:
+            response = self.client.get(url, {'page_size': 4, 'cursor': cursor} if cursor else {'page_size': 4})
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data[key]), 4)
+            rows.extend(response.data[key])
+            cursor = response.data['next']
+            if cursor is None:
+                return rows
+
+    def test_view_user_movements_pages(self):
+        self.create_movements(10)
+        rows = self.walk(reverse('api_view_user_movements', args=[self.user.pk]), 'movements')
+        expected = Movement.objects.order_by('date', 'id').values_list('id', flat=True)
+        self.assertEqual([row['id'] for row in rows], list(expected))
+
+    def test_view_all_movements_pages(self):
+        self.create_movements(5)
+        self.create_movements(6, user=User.objects.create(nickname='otro', email='otro@denarius.mx'))
+        rows = self.walk(reverse('api_view_all_movements'), 'movements')
+        self.assertEqual(sorted(row['id'] for row in rows), list(Movement.objects.values_list('id', flat=True)))
+
+    def test_later_pages_cost_the_same(self):
+        self.create_movements(10)
+        url = reverse('api_view_user_movements', args=[self.user.pk])
+        response = self.client.get(url, {'page_size': 4})
+        with self.assertNumQueries(3):
+            self.client.get(url, {'page_size': 4, 'cursor': response.data['next']})
+
+    def test_invalid_cursor(self):
+        self.create_movements(1)
+        url = reverse('api_view_user_movements', args=[self.user.pk])
+        self.assertEqual(self.client.get(url, {'cursor': 'nope'}).status_code, 400)
+        # Well formed tokens with values of the wrong type
+        for values in ([{}, 1], ['notadate', 1], ['2018-01-01', 'x'], [None, 1]):
+            self.assertEqual(self.client.get(url, {'cursor': encode_cursor(values)}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'cursor': encode_cursor(values), 'archived': '1'}).status_code,
+                             400)
+
+
+class StreamingTest(AccountsApiTestCase):
+
+    def test_stream_json(self):
+        self.create_movements(7)
+        with self.settings(API_STREAM_CHUNK_SIZE=3):
+            response = self.client.get(reverse('api_view_all_movements'), {'stream': 'json'})
+            body = json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(len(body['movements']), 7)
+        self.assertEqual(body['movements'][0]['category'], 'Categoria')
+
+    def test_stream_ndjson(self):
+        response = self.client.get(reverse('api_view_all_categories'), {'stream': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Comida'])
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+
+    def test_unknown_stream_format(self):
+        response = self.client.get(reverse('api_view_all_accounts'), {'stream': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BalanceTest(AccountsApiTestCase):
+
+    def setUp(self):
+        super(BalanceTest, self).setUp()
+        self.savings = Account.objects.create(user=self.user, name='Ahorro', description='', money=Decimal('0'))
+
+    def register(self, amount, type_movement, account_transfer=None):
+        response = self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': amount, 'type': type_movement, 'date': '2018-02-01', 'concept': 'Prueba',
+            'account_transfer_id': account_transfer or '',
+        })
+        self.assertEqual(response.status_code, 200)
+        return Movement.objects.latest('pk')
+
+    def assert_money(self, account, money):
+        self.assertEqual(Account.objects.get(pk=account.pk).money, Decimal(money))
+
+    def test_register(self):
+        self.register('250.50', 'ingreso')
+        self.register('50.50', 'Egreso')
+        self.assert_money(self.account, '1200.00')
+
+    def test_transfer(self):
+        self.register('300', 'transferencia', account_transfer=self.savings.pk)
+        self.assert_money(self.account, '700.00')
+        self.assert_money(self.savings, '300.00')
+
+    def test_update_moves_effect_between_accounts(self):
+        movement = self.register('100', 'egreso')
+        response = self.client.post(reverse('api_update_movement'), {
+            'movement_id': movement.pk, 'category_id': self.category.pk, 'account_id': self.savings.pk,
+            'amount': '40', 'type': 'ingreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assert_money(self.account, '1000.00')
+        self.assert_money(self.savings, '40.00')
+
+    def test_delete_reverts(self):
+        movement = self.register('300', 'transferencia', account_transfer=self.savings.pk)
+        self.client.post(reverse('api_delete_movement'), {'movement_id': movement.pk})
+        self.client.post(reverse('api_delete_movement'), {'movement_id': movement.pk})
+        self.assert_money(self.account, '1000.00')
+        self.assert_money(self.savings, '0.00')
+
+    def test_missing_category(self):
+        response = self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': 999, 'account_id': self.account.pk, 'amount': '1',
+            'type': 'ingreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'category_id': ['Category not found.']})
+
+    def test_accounts_of_other_users(self):
+        other = User.objects.create(nickname='otro', email='otro@denarius.mx')
+        foreign = Account.objects.create(user=other, name='Ajena', description='', money=Decimal('50'))
+        response = self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk, 'amount': '10',
+            'type': 'transferencia', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': foreign.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'account_transfer_id': ['Account not found.']})
+
+        movement = self.register('100', 'egreso')
+        response = self.client.post(reverse('api_update_movement'), {
+            'movement_id': movement.pk, 'category_id': self.category.pk, 'account_id': foreign.pk, 'amount': '10',
+            'type': 'egreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'account_id': ['Account not found.']})
+
+        self.assert_money(self.account, '900.00')
+        self.assert_money(foreign, '50.00')
+
+    def test_reconcile_balances(self):
+        self.register('300', 'transferencia', account_transfer=self.savings.pk)
+        self.register('25', 'egreso')
+        Account.objects.filter(pk=self.account.pk).update(money=Decimal('1'))
+
+        call_command('reconcile_balances', batch_size=1, stdout=StringIO())
+
+        self.assert_money(self.account, '675.00')
+        self.assert_money(self.savings, '300.00')
+
+    def test_reconcile_keeps_money_set_by_update_account(self):
+        self.register('25', 'egreso')
+        self.client.post(reverse('api_update_account'), {
+            'account_id': self.account.pk, 'name': 'Efectivo', 'description': '', 'money': '500',
+        })
+
+        call_command('reconcile_balances', stdout=StringIO())
+
+        self.assert_money(self.account, '500.00')
+
+
+class UserCacheTest(AccountsApiTestCase):
+
+    def test_served_from_cache_until_a_write(self):
+        url = reverse('api_view_user_categories', args=[self.user.pk])
+        self.client.get(url)
+        before = cache_stats()
+
+        # Only the data version, for the ETag and for the cache key
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([category['name'] for category in response.data['categories']], ['Comida'])
+        self.assertEqual(cache_stats()['hits'], before['hits'] + 1)
+
+        self.client.post(reverse('api_register_category'), {
+            'user_id': self.user.pk, 'name': 'Agua', 'description': '', 'color': '#000000',
+        })
+
+        response = self.client.get(url)
+        self.assertEqual([category['name'] for category in response.data['categories']], ['Agua', 'Comida'])
+        self.assertEqual(cache_stats()['misses'], before['misses'] + 1)
+
+    def test_write_seen_by_another_process(self):
+        url = reverse('api_view_user_categories', args=[self.user.pk])
+        self.client.get(url)
+
+        # A write served by another process, which can not reach the cache of this one
+        Category.objects.filter(pk=self.category.pk).update(name='Despensa')
+        User.objects.filter(pk=self.user.pk).update(data_version=F('data_version') + 1)
+
+        self.assertEqual([category['name'] for category in self.client.get(url).data['categories']], ['Despensa'])
+
+    def test_movement_writes_refresh_balances(self):
+        url = reverse('api_view_user_accounts', args=[self.user.pk])
+        self.client.get(url)
+
+        self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '100', 'type': 'egreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['accounts'][0]['money'], Decimal('900.00'))
+
+
+class ConditionalGetTest(AccountsApiTestCase):
+
+    def test_not_modified_until_a_write(self):
+        url = reverse('api_view_user_categories', args=[self.user.pk])
+        etag = self.client.get(url)['ETag']
+
+        # Only the data version of the user
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.post(reverse('api_update_category'), {
+            'category_id': self.category.pk, 'name': 'Despensa', 'description': '', 'color': '#000000',
+        })
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_single_row(self):
+        url = reverse('api_view_single_account', args=[self.account.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('api_delete_account'), {'account_id': self.account.pk})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_etag_depends_on_query(self):
+        self.create_movements(3)
+        url = reverse('api_view_user_movements', args=[self.user.pk])
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'page_size': 1})['ETag'])
+
+
+class BenchmarkTest(TestCase):
+
+    def test_every_route_is_measured(self):
+        call_command('seed_data', users=2, accounts=2, categories=2, movements=5, stdout=StringIO())
+        output = StringIO()
+
+        call_command('benchmark_api', iterations=1, stdout=output, stderr=StringIO())
+
+        report = json.loads(output.getvalue())
+        self.assertEqual(sorted(report['routes']), sorted(route_names()))
+        self.assertEqual(report['dataset']['movements'], 10)
+        for name, result in report['routes'].items():
+            self.assertLess(result['status'], 500, name)
+        # The writes of the benchmark are rolled back
+        self.assertEqual(Movement.objects.count(), 10)
+
+
+class ServerTimingTest(AccountsApiTestCase):
+
+    def metrics(self, response):
+        return sorted(metric.split(';', 1)[0] for metric in response['Server-Timing'].split(', '))
+
+    def test_header(self):
+        self.create_movements(3)
+        response = self.client.get(reverse('api_view_all_movements'))
+        # The queries are only counted with PERFORMANCE_QUERY_TIMING, off by default
+        self.assertEqual(self.metrics(response), ['render', 'total', 'view'])
+
+    def test_query_timing(self):
+        self.create_movements(3)
+        with self.settings(PERFORMANCE_QUERY_TIMING=True), self.assertNumQueries(1):
+            response = self.client.get(reverse('api_view_all_movements'))
+        self.assertEqual(self.metrics(response), ['db', 'render', 'total', 'view'])
+        self.assertRegex(response['Server-Timing'], r'db;dur=[0-9.]+;desc="1 queries"')
+        # The cursors are only wrapped during the request
+        self.assertNotIn('make_cursor', vars(connection))
+
+    def test_slow_requests_are_logged(self):
+        with self.settings(PERFORMANCE_SLOW_REQUEST_MS=0, PERFORMANCE_QUERY_TIMING=True), \
+                self.assertLogs('denarius.performance', 'WARNING') as logs:
+            self.client.get(reverse('api_view_single_account', args=[self.account.pk]))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['path'], reverse('api_view_single_account', args=[self.account.pk]))
+        self.assertEqual(line['queries'], 2)
+
+
+class RegisterMovementsTest(AccountsApiTestCase):
+
+    def item(self, **values):
+        item = {'category_id': self.category.pk, 'account_id': self.account.pk, 'amount': '10.00', 'type': 'egreso',
+                'date': '2018-02-01', 'concept': 'Estado de cuenta', 'account_transfer_id': None}
+        item.update(values)
+        return item
+
+    def post(self, items):
+        body = json.dumps({'user_id': self.user.pk, 'movements': items})
+        return self.client.post(reverse('api_register_movements'), body, content_type='application/json')
+
+    def test_partial_success(self):
+        other = User.objects.create(nickname='otro', email='otro@denarius.mx')
+        foreign = Category.objects.create(user=other, name='Ajena', description='')
+        items = [self.item(), self.item(amount='abc'), self.item(category_id=foreign.pk), self.item(amount='5.50'),
+                 self.item(date='2018-02-31'), {'concept': 'Sin datos'}]
+
+        response = self.post(items)
+
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([result['status'] for result in response.data['results']], [200, 400, 404, 200, 400, 400])
+        self.assertIn('category_id', response.data['results'][2]['errors'])
+        self.assertEqual(Movement.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Account.objects.get(pk=self.account.pk).money, Decimal('984.50'))
+
+    def test_deleted_relations_are_not_found(self):
+        deleted = Account.objects.create(user=self.user, name='Cerrada', description='', money=Decimal('0'),
+                                         is_active=False)
+        Category.objects.filter(pk=self.category.pk).update(is_active=False)
+
+        response = self.post([self.item(account_id=deleted.pk), self.item(account_transfer_id=deleted.pk)])
+
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual([sorted(result['errors']) for result in response.data['results']], [
+            ['account_id', 'category_id'], ['account_transfer_id', 'category_id']
+        ])
+
+    def test_query_count_does_not_grow_with_items(self):
+        # savepoint, user, categories, accounts, nested savepoint, data version and its read, insert, balance, rollup,
+        # snapshots, releases; the first post also inserts the rollup row of the month inside its own savepoint
+        for total, queries in ((1, 16), (20, 13)):
+            with self.assertNumQueries(queries):
+                response = self.post([self.item() for _ in range(total)])
+            self.assertEqual(response.data['created'], total)
+
+    def test_too_many_items(self):
+        with self.settings(API_MAX_BULK_MOVEMENTS=2):
+            response = self.post([self.item()] * 3)
+        self.assertEqual(response.status_code, 400)
+
+
+class MovementSummaryTest(AccountsApiTestCase):
+
+    def setUp(self):
+        super(MovementSummaryTest, self).setUp()
+        food = self.category
+        salary = Category.objects.create(user=self.user, name='Sueldo', description='')
+        for day, category, amount, type_movement in [(date(2018, 1, 1), food, '10.00', 'egreso'),
+                                                     (date(2018, 1, 7), food, '5.50', 'egreso'),
+                                                     (date(2018, 1, 8), salary, '100.00', 'ingreso'),
+                                                     (date(2018, 2, 3), food, '1.00', 'egreso')]:
+            Movement.objects.create(user=self.user, category=category, account=self.account, amount=amount,
+                                    type=type_movement, date=day, concept='')
+        Movement.objects.create(user=self.user, category=food, account=self.account, amount='99', type='egreso',
+                                date=date(2018, 1, 2), concept='', is_active=False)
+        rebuild_rollups([self.user.pk])
+
+    def summary(self, **params):
+        response = self.client.get(reverse('api_view_movement_summary', args=[self.user.pk]), params)
+        return [(str(row['period']), row.get('type'), row['total'], row['count']) for row in response.data['summary']]
+
+    def test_month_by_type(self):
+        self.assertEqual(self.summary(period='month', group='type'), [
+            ('2018-01-01', 'egreso', Decimal('15.50'), 2),
+            ('2018-01-01', 'ingreso', Decimal('100.00'), 1),
+            ('2018-02-01', 'egreso', Decimal('1.00'), 1),
+        ])
+
+    def test_week_and_range(self):
+        self.assertEqual(self.summary(period='week', start='2018-01-02', end='2018-01-31'), [
+            ('2018-01-01', None, Decimal('5.50'), 1),
+            ('2018-01-08', None, Decimal('100.00'), 1),
+        ])
+
+    def test_invalid_parameters(self):
+        url = reverse('api_view_movement_summary', args=[self.user.pk])
+        self.assertEqual(self.client.get(url, {'period': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'group': 'concept'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2018-13-01'}).status_code, 400)
+
+    def test_year_from_rollups(self):
+        with self.assertNumQueries(3):
+            rows = self.summary(period='year', start='2018-01-01', end='2018-12-31')
+        self.assertEqual(rows, [('2018-01-01', None, Decimal('116.50'), 4)])
+
+
+class MonthlyRollupTest(BalanceTest):
+
+    def rollups(self):
+        return sorted(MonthlyRollup.objects.filter(movements__gt=0).values_list(
+            'account_id', 'category_id', 'type', 'month', 'amount', 'movements'
+        ))
+
+    def assert_rebuilt_matches(self):
+        incremental = self.rollups()
+        call_command('rebuild_rollups', batch_size=1, stdout=StringIO())
+        self.assertEqual(incremental, self.rollups())
+        return incremental
+
+    def test_register_update_delete(self):
+        first = self.register('100', 'egreso')
+        self.register('20', 'egreso')
+        self.client.post(reverse('api_update_movement'), {
+            'movement_id': first.pk, 'category_id': self.category.pk, 'account_id': self.savings.pk,
+            'amount': '40', 'type': 'ingreso', 'date': '2018-03-05', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        second = Movement.objects.latest('pk')
+        self.client.post(reverse('api_delete_movement'), {'movement_id': second.pk})
+
+        self.assertEqual(self.assert_rebuilt_matches(), [
+            (self.savings.pk, self.category.pk, 'ingreso', date(2018, 3, 1), Decimal('40.00'), 1),
+        ])
+
+    def test_register_movements(self):
+        body = json.dumps({'user_id': self.user.pk, 'movements': [
+            {'category_id': self.category.pk, 'account_id': self.account.pk, 'amount': amount, 'type': 'egreso',
+             'date': day, 'concept': 'Estado de cuenta'}
+            for amount, day in [('1.50', '2018-01-31'), ('2.50', '2018-01-01'), ('3', '2018-02-01')]
+        ]})
+        self.client.post(reverse('api_register_movements'), body, content_type='application/json')
+
+        self.assertEqual(self.assert_rebuilt_matches(), [
+            (self.account.pk, self.category.pk, 'egreso', date(2018, 1, 1), Decimal('4.00'), 2),
+            (self.account.pk, self.category.pk, 'egreso', date(2018, 2, 1), Decimal('3.00'), 1),
+        ])
+
+
+class BalanceSeriesTest(AccountsApiTestCase):
+
+    def setUp(self):
+        super(BalanceSeriesTest, self).setUp()
+        self.savings = Account.objects.create(user=self.user, name='Ahorro', description='', money=Decimal('0'))
+        for day, amount, type_movement, transfer, is_active in [
+            (date(2018, 1, 5), '100.10', 'ingreso', None, True),
+            (date(2018, 1, 5), '30.00', 'egreso', None, True),
+            (date(2018, 1, 10), '50.00', 'transferencia', self.savings.pk, True),
+            (date(2018, 1, 12), '999.00', 'egreso', None, False),
+            (date(2018, 2, 1), '20.00', 'egreso', None, True),
+        ]:
+            Movement.objects.create(user=self.user, category=self.category, account=self.account, amount=amount,
+                                    type=type_movement, date=day, concept='', account_transfer=transfer,
+                                    is_active=is_active)
+
+    def series(self, **params):
+        response = self.client.get(reverse('api_view_balance_series', args=[self.user.pk]), params)
+        return [(row['name'], row['opening'], [(str(point['date']), point['balance']) for point in row['points']])
+                for row in response.data['series']]
+
+    def test_all_accounts(self):
+        expected = [
+            ('Ahorro', Decimal('0'), [('2018-01-10', Decimal('50.00'))]),
+            ('Efectivo', Decimal('1000'), [('2018-01-05', Decimal('1070.10')), ('2018-01-10', Decimal('1020.10')),
+                                           ('2018-02-01', Decimal('1000.10'))]),
+        ]
+        self.assertEqual(self.series(), expected)
+
+        # Same result adding the daily changes in Python, as on data bases without window functions
+        _window_functions[connection.alias] = False
+        try:
+            self.assertEqual(self.series(), expected)
+        finally:
+            _window_functions.pop(connection.alias)
+
+    def test_range_and_downsampling(self):
+        self.assertEqual(self.series(account=self.account.pk, start='2018-01-06', end='2018-01-31'), [
+            ('Efectivo', Decimal('1070.10'), [('2018-01-10', Decimal('1020.10'))]),
+        ])
+        self.assertEqual(self.series(account=self.account.pk, points=2), [
+            ('Efectivo', Decimal('1000'), [('2018-01-10', Decimal('1020.10')), ('2018-02-01', Decimal('1000.10'))]),
+        ])
+
+    def test_foreign_account(self):
+        other = User.objects.create(nickname='otro', email='otro@denarius.mx')
+        account = Account.objects.create(user=other, name='Ajena', description='', money=Decimal('0'))
+        url = reverse('api_view_balance_series', args=[self.user.pk])
+        self.assertEqual(self.client.get(url, {'account': account.pk}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'points': '-1'}).status_code, 400)
+
+
+class ArchiveTest(BalanceSeriesTest):
+
+    def archive(self, **options):
+        call_command('archive_movements', batch_size=1, stdout=StringIO(), **options)
+
+    def aggregates(self):
+        summary = self.client.get(reverse('api_view_movement_summary', args=[self.user.pk]), {'period': 'week'})
+        balance = self.client.get(reverse('api_view_account_balance', args=[self.account.pk]), {'date': '2018-01-31'})
+        out = StringIO()
+        call_command('reconcile_balances', dry_run=True, stdout=out)
+        rollups = sorted(MonthlyRollup.objects.values_list('account_id', 'type', 'month', 'amount', 'movements'))
+        return self.series(), summary.data, balance.data, out.getvalue(), rollups
+
+    def movements(self, **params):
+        response = self.client.get(reverse('api_view_user_movements', args=[self.user.pk]), params)
+        if response.status_code == 204:
+            return [], None
+        return [movement['amount'] for movement in response.data['movements']], response.data['next']
+
+    def test_soft_deleted_movements_past_retention(self):
+        deleted = Movement.all_objects.get(is_active=False)
+        self.archive()
+        self.assertTrue(Movement.all_objects.filter(pk=deleted.pk).exists())
+
+        Movement.all_objects.filter(pk=deleted.pk).update(delete_date=date(2018, 1, 12))
+        self.archive()
+        self.assertFalse(Movement.all_objects.filter(pk=deleted.pk).exists())
+        self.assertFalse(ArchivedMovement.all_objects.get(pk=deleted.pk).is_active)
+        self.assertEqual(Movement.all_objects.count(), 4)
+
+    def test_old_movements_keep_the_aggregates(self):
+        rebuild_rollups([self.user.pk])
+        before = self.aggregates()
+
+        newest = Movement.all_objects.latest('pk')
+        self.archive(older_than_years=5)
+        # The newest movement stays, so the ids of the archive are never handed out again
+        self.assertEqual(list(Movement.all_objects.values_list('pk', flat=True)), [newest.pk])
+        self.assertEqual(Movement.all_objects.count() + ArchivedMovement.all_objects.count(), 5)
+        self.assertEqual(self.aggregates()[:4], before[:4])
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(self.aggregates(), before)
+
+    def test_archived_history_is_opt_in(self):
+        Movement.objects.create(user=self.user, category=self.category, account=self.account, amount='7.00',
+                                type='egreso', date=date.today(), concept='')
+        old = Movement.objects.get(amount='20.00')
+        self.archive(older_than_years=5)
+
+        self.assertEqual(self.movements(), ([Decimal('7.00')], None))
+        amounts, cursor = self.movements(archived='1', page_size=3)
+        self.assertEqual(amounts, [Decimal('100.10'), Decimal('30.00'), Decimal('50.00')])
+        self.assertEqual(self.movements(archived='1', page_size=3, cursor=cursor),
+                         ([Decimal('20.00'), Decimal('7.00')], None))
+
+        url = reverse('api_view_single_movement', args=[old.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, {'archived': '1'}).data['movement']['amount'], Decimal('20.00'))
+
+
+class SearchMovementsTest(AccountsApiTestCase):
+
+    def setUp(self):
+        super(SearchMovementsTest, self).setUp()
+        self.savings = Account.objects.create(user=self.user, name='Ahorro', description='', money=Decimal('0'))
+        for day, account, concept in [(date(2018, 1, 1), self.account, 'Pago de renta'),
+                                      (date(2018, 2, 1), self.account, 'Renta renta de la casa'),
+                                      (date(2018, 3, 1), self.savings, 'Pago de renta'),
+                                      (date(2018, 3, 2), self.account, 'Nómina quincenal')]:
+            Movement.objects.create(user=self.user, category=self.category, account=account, amount='1', type='egreso',
+                                    date=day, concept=concept)
+        other = User.objects.create(nickname='otro', email='otro@denarius.mx')
+        Movement.objects.create(user=other, category=self.category, account=self.account, amount='1', type='egreso',
+                                date=date(2018, 1, 1), concept='Renta')
+
+    def search(self, **params):
+        response = self.client.get(reverse('api_search_movements', args=[self.user.pk]), params)
+        if response.status_code == 204:
+            return [], None
+        return [(movement['concept'], str(movement['date'])) for movement in response.data['movements']], \
+            response.data['next']
+
+    def test_ranked_and_filtered(self):
+        self.assertEqual(self.search(q='renta')[0], [
+            ('Renta renta de la casa', '2018-02-01'), ('Pago de renta', '2018-03-01'), ('Pago de renta', '2018-01-01'),
+        ])
+        self.assertEqual(self.search(q='pago RENT', account=self.account.pk)[0], [('Pago de renta', '2018-01-01')])
+        self.assertEqual(self.search(q='renta', start='2018-02-15')[0], [('Pago de renta', '2018-03-01')])
+        self.assertEqual(self.search(q='nomina quin')[0], [('Nómina quincenal', '2018-03-02')])
+        self.assertEqual(self.search(q='gasolina'), ([], None))
+
+    def test_pages(self):
+        rows, cursor = self.search(q='renta', page_size=2)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(self.search(q='renta', page_size=2, cursor=cursor), ([('Pago de renta', '2018-01-01')], None))
+
+    def test_index_follows_the_writes(self):
+        movement = Movement.objects.get(concept='Nómina quincenal')
+        self.client.post(reverse('api_update_movement'), {
+            'movement_id': movement.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '1', 'type': 'egreso', 'date': '2018-03-02', 'concept': 'Aguinaldo', 'account_transfer_id': '',
+        })
+        self.assertEqual(self.search(q='nomina'), ([], None))
+        self.assertEqual(self.search(q='aguinaldo')[0], [('Aguinaldo', '2018-03-02')])
+
+        self.client.post(reverse('api_delete_movement'), {'movement_id': movement.pk})
+        self.assertEqual(self.search(q='aguinaldo'), ([], None))
+
+    def test_without_full_text_index(self):
+        _backends[connection.alias] = None
+        try:
+            self.assertEqual(self.search(q='renta pago')[0], [('Pago de renta', '2018-03-01'),
+                                                              ('Pago de renta', '2018-01-01')])
+        finally:
+            _backends.pop(connection.alias)
+
+    def test_short_words_match_on_every_backend(self):
+        # Words below the minimum length of the MySQL index are still required, as with the LIKE search
+        found = {}
+        index = search_backend(connection)
+        for backend in (index, None):
+            _backends[connection.alias] = backend
+            try:
+                found[backend] = [sorted(self.search(q=q)[0]) for q in ('pago de', 'de', 'la casa')]
+            finally:
+                _backends.pop(connection.alias)
+        self.assertEqual(found[None], [
+            [('Pago de renta', '2018-01-01'), ('Pago de renta', '2018-03-01')],
+            [('Pago de renta', '2018-01-01'), ('Pago de renta', '2018-03-01'),
+             ('Renta renta de la casa', '2018-02-01')],
+            [('Renta renta de la casa', '2018-02-01')],
+        ])
+        self.assertEqual(found[index], found[None])
+
+    def test_invalid_parameters(self):
+        url = reverse('api_search_movements', args=[self.user.pk])
+        self.assertEqual(self.client.get(url, {'q': '"*'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'renta', 'cursor': 'x'}).status_code, 400)
+        for values in (['a', 'b'], [1.5, 'b'], [True, 1]):
+            self.assertEqual(self.client.get(url, {'q': 'renta', 'cursor': encode_cursor(values)}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_search_movements', args=[0]), {'q': 'renta'}).status_code, 404)
+
+
+class BalanceSnapshotTest(BalanceSeriesTest):
+
+    def balance(self, account, day):
+        response = self.client.get(reverse('api_view_account_balance', args=[account.pk]), {'date': day})
+        return response.data['balance']['balance']
+
+    def snapshots(self, account):
+        return list(BalanceSnapshot.objects.filter(account=account).order_by('date').values_list('date', 'balance'))
+
+    def test_build(self):
+        call_command('build_balance_snapshots', until='2018-03-01', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.snapshots(self.account), [
+            (date(2018, 1, 31), Decimal('1020.10')), (date(2018, 2, 28), Decimal('1000.10')),
+            (date(2018, 3, 31), Decimal('1000.10')),
+        ])
+        self.assertEqual(self.snapshots(self.savings), [
+            (date(2018, 1, 31), Decimal('50.00')), (date(2018, 2, 28), Decimal('50.00')),
+            (date(2018, 3, 31), Decimal('50.00')),
+        ])
+
+    def test_lookup_matches_history(self):
+        expected = [self.balance(self.account, day) for day in ('2018-01-04', '2018-01-05', '2018-02-15', '2019-01-01')]
+        self.assertEqual(expected, [Decimal('1000'), Decimal('1070.10'), Decimal('1000.10'), Decimal('1000.10')])
+
+        call_command('build_balance_snapshots', until='2018-12-31', stdout=StringIO())
+        # account, data version, snapshot, sum of the movements of the hot table and the archive
+        with self.assertNumQueries(4):
+            self.balance(self.account, '2018-02-15')
+        self.assertEqual([self.balance(self.account, day) for day in ('2018-01-04', '2018-01-05', '2018-02-15',
+                                                                      '2019-01-01')], expected)
+
+    def test_back_dated_edit_only_drops_later_snapshots(self):
+        call_command('build_balance_snapshots', until='2018-12-31', stdout=StringIO())
+        movement = Movement.objects.get(amount='20.00')
+
+        self.client.post(reverse('api_update_movement'), {
+            'movement_id': movement.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '25', 'type': 'egreso', 'date': '2018-03-10', 'concept': '', 'account_transfer_id': '',
+        })
+
+        self.assertEqual(self.snapshots(self.account), [(date(2018, 1, 31), Decimal('1020.10'))])
+        self.assertEqual(len(self.snapshots(self.savings)), 12)
+        self.assertEqual(self.balance(self.account, '2018-02-28'), Decimal('1020.10'))
+        self.assertEqual(self.balance(self.account, '2018-03-31'), Decimal('995.10'))
+
+
+class ReplicaRoutingTest(AccountsApiTestCase):
+
+    def read_alias(self, method, cookies=None):
+        request = getattr(RequestFactory(), method)('/api/accounts/view_all_accounts/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaRoutingMiddleware()
+        middleware.process_request(request)
+        alias = router.db_for_read(Account)
+        response = middleware.process_response(request, HttpResponse())
+        read_from_replicas(False)
+        return alias, response.cookies
+
+    def test_reads_go_to_the_replicas(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            self.assertEqual(self.read_alias('get')[0], 'replica')
+            self.assertEqual(self.read_alias('post')[0], 'default')
+            self.assertEqual(router.db_for_write(Account), 'default')
+        # Outside of a request and without replicas everything stays on the primary
+        self.assertEqual(router.db_for_read(Account), 'default')
+        self.assertEqual(self.read_alias('get')[0], 'default')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        with self.settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=30):
+            cookies = self.read_alias('post')[1]
+            self.assertEqual(cookies['denarius_primary']['max-age'], 30)
+
+            self.assertEqual(self.read_alias('get', {'denarius_primary': cookies['denarius_primary'].value})[0],
+                             'default')
+            self.assertEqual(self.read_alias('get', {'denarius_primary': '%.3f' % (time.time() - 1)})[0], 'replica')
+            self.assertEqual(self.read_alias('get', {'denarius_primary': 'x'})[0], 'replica')
+
+    def test_raw_reads_follow_the_router(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            read_from_replicas(True)
+            try:
+                # The tests have no replica alias, reaching it proves where the query was sent
+                for read in (lambda: movement_totals([self.account.pk]),
+                             lambda: list(cumulative_changes([self.account.pk], None)),
+                             lambda: search_concepts(self.user.pk, ['renta'])):
+                    with self.assertRaises(ConnectionDoesNotExist):
+                        read()
+            finally:
+                read_from_replicas(False)
+
+    def test_cache_key_follows_the_replica_data_version(self):
+        url = reverse('api_view_user_accounts', args=[self.user.pk])
+        with self.settings(DATABASE_REPLICAS=['default']):
+            self.client.get(url)
+            # A write that the replica already has (here the replica is the primary itself)
+            Account.objects.filter(pk=self.account.pk).update(name='Cartera')
+            User.objects.filter(pk=self.user.pk).update(data_version=F('data_version') + 1)
+            self.assertEqual(self.client.get(url).data['accounts'][0]['name'], 'Cartera')
+
+    def test_requests_reset_the_routing(self):
+        response = self.client.post(reverse('api_delete_account'), {'account_id': self.account.pk})
+        self.assertIn('denarius_primary', response.cookies)
+        self.assertFalse(reading_from_replicas())
+
+
+class ConnectionStatsTest(AccountsApiTestCase):
+
+    def setUp(self):
+        super(ConnectionStatsTest, self).setUp()
+        self.client.force_login(User.objects.create(nickname='admin', email='admin@denarius.mx', is_staff=True))
+
+    def stats(self):
+        return self.client.get(reverse('api_view_connection_stats')).data['connections']
+
+    def test_reused(self):
+        before = self.stats()
+        self.client.get(reverse('api_view_single_account', args=[self.account.pk]))
+        after = self.stats()
+        # The connection of the test is open for both requests
+        self.assertEqual(after['reused'] - before['reused'], 2)
+        self.assertEqual(after['opened'], before['opened'])
+
+    def test_dropped_by_health_check(self):
+        before = self.stats()
+        # A connection that the server closed while idle; closing it is skipped to keep the test transaction
+        connection.is_usable = lambda: False
+        connection.close = lambda: None
+        try:
+            # Used moments ago, so it is not pinged
+            self.client.get(reverse('api_view_single_account', args=[self.account.pk]))
+            with self.settings(CONN_HEALTH_CHECK_IDLE_SECONDS=0):
+                self.client.get(reverse('api_view_single_account', args=[self.account.pk]))
+                with self.settings(CONN_HEALTH_CHECKS=False):
+                    self.client.get(reverse('api_view_single_account', args=[self.account.pk]))
+        finally:
+            del connection.is_usable, connection.close
+        after = self.stats()
+        self.assertEqual(after['dropped'] - before['dropped'], 1)
+        self.assertEqual(after['reused'] - before['reused'], 3)
+
+    def test_opened(self):
+        before = self.stats()
+        other = type(connections['default'])(dict(connection.settings_dict, CONN_MAX_AGE=60), alias='stats')
+        other.connect()
+        other.close()
+        after = self.stats()
+        self.assertEqual(after['opened'] - before['opened'], 1)
+        self.assertGreaterEqual(after['average_setup_ms'], 0)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_view_connection_stats')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_view_cache_stats')).status_code, 403)
+
+
+class ActiveManagerTest(AccountsApiTestCase):
+
+    def test_soft_deleted_rows(self):
+        self.client.post(reverse('api_delete_category'), {'category_id': self.category.pk})
+
+        self.assertFalse(Category.objects.filter(pk=self.category.pk).exists())
+        self.assertTrue(Category.all_objects.filter(pk=self.category.pk).exists())
+        self.assertEqual(self.client.get(reverse('api_view_single_category', args=[self.category.pk])).status_code,
+                         404)
+        self.assertEqual(self.client.get(reverse('api_view_user_categories', args=[self.user.pk])).status_code, 204)
+        # The admin listing and the writes still reach the deleted rows
+        self.assertEqual(len(self.client.get(reverse('api_view_all_categories')).data['categories']), 1)
+        self.assertEqual(self.client.post(reverse('api_delete_category'), {'category_id': self.category.pk})
+                         .status_code, 200)
+
+    def test_movements_of_a_deleted_account_keep_its_balance(self):
+        self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '10', 'type': 'egreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.client.post(reverse('api_delete_account'), {'account_id': self.account.pk})
+
+        # No new movements on the deleted account, but deleting an old one still reverts its balance
+        response = self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '10', 'type': 'egreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.client.post(reverse('api_delete_movement'), {'movement_id': Movement.all_objects.latest('pk').pk})
+        self.assertEqual(Account.all_objects.get(pk=self.account.pk).money, Decimal('1000.00'))
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN of SQLite')
+    def test_active_queries_use_the_active_indexes(self):
+        for queryset, index in [
+            (Category.objects.filter(user=self.user).order_by('name'), 'accounts_category_active_name'),
+            (Account.objects.filter(user=self.user).order_by('name'), 'accounts_account_active_name'),
+            (Movement.objects.filter(user=self.user).order_by('date', 'id'), 'accounts_movement_active_date'),
+        ]:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN %s' % sql, params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            # The ORM binds is_active as a parameter, the index has to match it as a column
+            self.assertIn('USING INDEX %s (user_id=? AND is_active=?)' % index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SyncTest(AccountsApiTestCase):
+
+    def sync(self, token=None):
+        response = self.client.get(reverse('api_sync', args=[self.user.pk]), {'token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_and_delta(self):
+        first = self.sync()
+        self.assertTrue(first['full'])
+        self.assertEqual([category['id'] for category in first['categories']], [self.category.pk])
+        self.assertEqual(first['accounts'][0]['money'], Decimal('1000.00'))
+
+        self.client.post(reverse('api_register_movement'), {
+            'user_id': self.user.pk, 'category_id': self.category.pk, 'account_id': self.account.pk,
+            'amount': '10', 'type': 'egreso', 'date': '2018-02-01', 'concept': 'Prueba', 'account_transfer_id': '',
+        })
+        self.client.post(reverse('api_delete_category'), {'category_id': self.category.pk})
+
+        second = self.sync(first['token'])
+        self.assertFalse(second['full'])
+        self.assertEqual(second['categories'], [])
+        self.assertEqual(second['deleted']['categories'], [self.category.pk])
+        self.assertEqual([account['money'] for account in second['accounts']], [Decimal('990.00')])
+        self.assertEqual([movement['concept'] for movement in second['movements']], ['Prueba'])
+
+        third = self.sync(second['token'])
+        self.assertEqual((third['categories'], third['accounts'], third['movements'], third['token']),
+                         ([], [], [], second['token']))
+
+    def test_deleted_movement_in_the_archive(self):
+        token = self.sync()['token']
+        movement = Movement.objects.create(user=self.user, category=self.category, account=self.account, amount='1',
+                                           type='egreso', date=date(2018, 1, 1), concept='Viejo')
+        self.client.post(reverse('api_delete_movement'), {'movement_id': movement.pk})
+        call_command('archive_movements', retention_days=0, stdout=StringIO())
+
+        self.assertEqual(self.sync(token)['deleted']['movements'], [movement.pk])
+
+    def test_transfer_to_an_account_of_another_user(self):
+        other = User.objects.create(nickname='otro', email='otro@denarius.mx')
+        foreign = Account.objects.create(user=other, name='Ajena', description='', money=Decimal('50'))
+        url = reverse('api_sync', args=[other.pk])
+        token = self.client.get(url).data['token']
+
+        # The API no longer accepts it, but an old transfer between users is still reverted on delete
+        movement = Movement.objects.create(user=self.user, category=self.category, account=self.account, amount='10',
+                                           type='transferencia', date=date(2018, 1, 1), concept='',
+                                           account_transfer=foreign.pk)
+        self.client.post(reverse('api_delete_movement'), {'movement_id': movement.pk})
+
+        response = self.client.get(url, {'token': token})
+        self.assertEqual([(account['id'], account['money']) for account in response.data['accounts']],
+                         [(foreign.pk, Decimal('40.00'))])
+
+    def test_invalid_token(self):
+        url = reverse('api_sync', args=[self.user.pk])
+        self.assertEqual(self.client.get(url, {'token': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'token': encode_cursor(['1'])}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_sync', args=[0])).status_code, 404)
+        # A token from the future, e.g. after restoring a backup, falls back to a full sync
+        self.assertTrue(self.sync(encode_cursor([1000]))['full'])
+
+    def test_active_indexes_survive_the_migrations(self):
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Movement._meta.db_table)
+        self.assertEqual(indexes['accounts_movement_active_date']['columns'], ['user_id', 'is_active', 'date'])
+
+
+class MultiGetTest(AccountsApiTestCase):
+
+    def test_keyed_by_id(self):
+        deleted = Category.objects.create(user=self.user, name='Borrada', description='', is_active=False)
+        url = reverse('api_view_many_categories')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': '%d,%d,999,%d' % (self.category.pk, deleted.pk, self.category.pk)})
+
+        self.assertEqual(list(response.data['categories']), [self.category.pk, deleted.pk, 999])
+        self.assertEqual(response.data['categories'][self.category.pk]['name'], 'Comida')
+        self.assertIsNone(response.data['categories'][deleted.pk])
+        self.assertIsNone(response.data['categories'][999])
+
+    def test_movements_and_archive(self):
+        self.create_movements(3)
+        ids = list(Movement.objects.order_by('pk').values_list('pk', flat=True))
+        Movement.objects.filter(pk=ids[0]).update(date=date(2000, 1, 1))
+        call_command('archive_movements', retention_days=90, older_than_years=20, stdout=StringIO())
+        url = reverse('api_view_many_movements')
+
+        with self.assertNumQueries(1):
+            movements = self.client.get(url, {'ids': ','.join(map(str, ids))}).data['movements']
+        self.assertIsNone(movements[ids[0]])
+        self.assertEqual(movements[ids[1]]['account'], 'Cuenta')
+
+        with self.assertNumQueries(2):
+            movements = self.client.get(url, {'ids': ','.join(map(str, ids)), 'archived': '1'}).data['movements']
+        self.assertEqual(movements[ids[0]]['date'], date(2000, 1, 1))
+
+    def test_invalid_ids(self):
+        url = reverse('api_view_many_accounts')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(map(str, range(1, 102)))}).status_code, 400)
+        # The limit counts distinct ids, and a long list fails at the first id past it
+        self.assertEqual(self.client.get(url, {'ids': ','.join(map(str, list(range(1, 101)) * 3))}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'ids': ','.join(map(str, range(1, 100001)))}).status_code, 400)
+
+
+class SideloadTest(AccountsApiTestCase):
+
+    def test_sideloaded_names(self):
+        self.create_movements(30)
+        url = reverse('api_view_user_movements', args=[self.user.pk])
+
+        # data version, user, movements, categories, accounts
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'sideload': '1', 'page_size': 10})
+
+        movement = response.data['movements'][0]
+        self.assertNotIn('category', movement)
+        self.assertEqual(response.data['categories'], {movement['category_id']: {'id': movement['category_id'],
+                                                                                 'name': 'Categoria'}})
+        self.assertEqual(list(response.data['accounts']), [movement['account_id']])
+        self.assertEqual(len(self.client.get(url, {'sideload': '1', 'cursor': response.data['next']})
+                             .data['movements']), 20)
+
+    def test_same_movements_as_the_default_format(self):
+        self.create_movements(5)
+        url = reverse('api_view_user_movements', args=[self.user.pk])
+        plain = self.client.get(url, {'archived': '1'}).data
+        sideloaded = self.client.get(url, {'archived': '1', 'sideload': '1'}).data
+
+        self.assertEqual([(movement['id'], movement['category'], movement['account'])
+                          for movement in plain['movements']],
+                         [(movement['id'], sideloaded['categories'][movement['category_id']]['name'],
+                           sideloaded['accounts'][movement['account_id']]['name'])
+                          for movement in sideloaded['movements']])
+
+
+class SparseFieldsTest(AccountsApiTestCase):
+
+    def get(self, name, arg=None, queries=None, **params):
+        with self.assertNumQueries(queries or (3 if arg else 1)) as queries:
+            response = self.client.get(reverse(name, args=[arg] if arg else []), params)
+        return response, queries.captured_queries[-1]['sql']
+
+    def test_only_the_requested_columns(self):
+        # The cached views read the data version once more for the cache key
+        response, sql = self.get('api_view_user_categories', self.user.pk, 4, fields='id,name')
+        self.assertEqual(response.data['categories'], [{'id': self.category.pk, 'name': 'Comida'}])
+        self.assertNotIn('description', sql)
+
+        response, sql = self.get('api_view_many_accounts', ids=str(self.account.pk), fields='money')
+        self.assertEqual(response.data['accounts'], {self.account.pk: {'money': Decimal('1000.00')}})
+        self.assertNotIn('description', sql)
+
+    def test_joins_only_the_requested_relations(self):
+        self.create_movements(3)
+        response, sql = self.get('api_view_user_movements', self.user.pk, fields='amount,category', page_size=2)
+        self.assertEqual(response.data['movements'][0], {'amount': Decimal('10.00'), 'category': 'Categoria'})
+        self.assertIn('accounts_category', sql)
+        self.assertNotIn('accounts_account', sql)
+        self.assertEqual(len(self.client.get(reverse('api_view_user_movements', args=[self.user.pk]), {
+            'fields': 'amount', 'cursor': response.data['next']
+        }).data['movements']), 1)
+
+        response, sql = self.get('api_view_all_movements', fields='id,concept')
+        self.assertEqual(set(response.data['movements'][0]), {'id', 'concept'})
+        self.assertNotIn('JOIN', sql)
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_view_single_category', args=[self.category.pk]), {'fields': 'user'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ColumnarFormatTest(AccountsApiTestCase):
+
+    def test_same_values_as_json(self):
+        self.create_movements(3)
+        Movement.objects.filter(pk=Movement.objects.first().pk).update(concept='Línea\u2028nueva')
+
+        for url in (reverse('api_view_all_movements'), reverse('api_view_user_movements', args=[self.user.pk]),
+                    reverse('api_view_all_categories')):
+            rows = json.loads(self.client.get(url, HTTP_ACCEPT='application/json').content.decode('utf-8'))
+            response = self.client.get(url, HTTP_ACCEPT=COLUMNS_MEDIA_TYPE)
+            self.assertEqual(response['Content-Type'], COLUMNS_MEDIA_TYPE)
+
+            columns = json.loads(response.content.decode('utf-8'))
+            for key, value in columns.items():
+                if isinstance(value, dict):
+                    self.assertEqual([dict(zip(value['columns'], row)) for row in value['rows']], rows[key])
+                else:
+                    self.assertEqual(value, rows[key])
+
+    def test_format_param(self):
+        response = self.client.get(reverse('api_view_user_accounts', args=[self.user.pk]), {'format': 'columns'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'accounts': {
+            'columns': ['id', 'name', 'description', 'money'],
+            'rows': [[self.account.pk, 'Efectivo', 'Cartera', 1000.0]],
+        }})
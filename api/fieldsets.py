@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from operator import attrgetter
+
+
+def attribute(key, path=None):
+    """
+    This function describe an output key that is a field of the row or of a related row
+    :param key: name in the output
+    :param path: field path as accepted by only, e.g. 'category__name' (optional, the key by default)
+    :return: (key, columns, value)
+    """
+    path = path or key
+    return key, (path,), attrgetter(path.replace('__', '.'))
+
+
+class Fieldset(object):
+    """
+    Output keys of a view with the model fields that each one reads. The client picks some of them with the fields
+    query param and only the columns of those keys are selected from the data base.
+    """
+
+    def __init__(self, *fields):
+        """
+        :param fields: (key, columns, value) where columns are field paths as accepted by only and value is a function
+                       of the row, see attribute
+        """
+        self.fields = OrderedDict((key, (columns, value)) for key, columns, value in fields)
+
+    def get_keys(self, request):
+        """
+        This function return the keys requested through the fields query param, a comma separated list, in the
+        order of the fieldset
+        :param request: petition
+        :return: list of keys, all of them when the param is missing
+        :raise ValueError: a key is not in the fieldset
+        """
+        requested = request.query_params.get('fields')
+        if not requested:
+            return list(self.fields)
+
+        requested = set(requested.split(','))
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise ValueError('Unknown fields %s' % ', '.join(sorted(unknown)))
+
+        return [key for key in self.fields if key in requested]
+
+    def select(self, queryset, keys, required=('id',)):
+        """
+        This function limit the queryset to the columns of the keys, joining only the related rows they read
+        :param queryset: queryset
+        :param keys: list from get_keys
+        :param required: field paths read besides the keys, e.g. the sort keys of the pagination
+        :return: queryset
+        """
+        columns = list(required)
+        for key in keys:
+            columns.extend(column for column in self.fields[key][0] if column not in columns)
+
+        related = sorted(set(column.split('__')[0] for column in columns if '__' in column))
+        if related:
+            queryset = queryset.select_related(*related)
+
+        return queryset.only(*columns)
+
+    def serializer(self, keys):
+        """
+        This function build the function that turns a row into the dict of the keys
+        :param keys: list from get_keys
+        :return: function
+        """
+        values = [(key, self.fields[key][1]) for key in keys]
+        return lambda row: {key: value(row) for key, value in values}
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = getattr(settings, 'API_PAGE_SIZE', 100)
+MAX_PAGE_SIZE = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when the cursor or page size sent by the client can not be used
+    """
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(repr(value))
+
+
+def encode_cursor(values):
+    """
+    This function build an opaque token from the sort key values of the last row of a page
+    :param values: list of sort key values
+    :return: url safe token
+    """
+    payload = json.dumps(values, default=_encode_value, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, length, types=None):
+    """
+    This function return the sort key values stored in a token built by encode_cursor
+    :param token: url safe token
+    :param length: number of sort keys expected
+    :param types: accepted type or tuple of types of each value, e.g. (float, int) (optional)
+    :return: list of sort key values
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode((token + padding).encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursor('Malformed cursor')
+
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Malformed cursor')
+
+    # bool is an int for isinstance, but never a valid sort key
+    if types and any(isinstance(value, bool) or not isinstance(value, accepted)
+                     for value, accepted in zip(values, types)):
+        raise InvalidCursor('Malformed cursor')
+
+    return values
+
+
+def cursor_values(model, ordering, values):
+    """
+    This function convert the values of a decoded cursor to the python type of their sort keys, so a cursor with
+    values of the wrong type is rejected instead of failing in the query
+    :param model: model of the rows
+    :param ordering: sort keys as accepted by order_by, e.g. ('date', 'id')
+    :param values: values from decode_cursor
+    :return: list of sort key values
+    """
+    try:
+        values = [model._meta.get_field(key.lstrip('-')).to_python(value) for key, value in zip(ordering, values)]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor('Malformed cursor')
+
+    if None in values:
+        raise InvalidCursor('Malformed cursor')
+
+    return values
+
+
+def get_page_size(request):
+    """
+    This function return the page size requested by the client, bounded by API_MAX_PAGE_SIZE
+    :param request: petition
+    :return: page size
+    """
+    try:
+        page_size = int(request.query_params.get('page_size', PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor('Invalid page size')
+
+    if page_size < 1:
+        raise InvalidCursor('Invalid page size')
+
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def after(ordering, values):
+    """
+    This function build the filter that selects the rows located after the given sort key values
+    :param ordering: sort keys as accepted by order_by, e.g. ('-register_date', 'id')
+    :param values: sort key values of the last row already returned
+    :return: Q object
+    """
+    condition = Q()
+    equal = {}
+
+    for key, value in zip(ordering, values):
+        name = key.lstrip('-')
+        lookup = '%s__%s' % (name, 'lt' if key.startswith('-') else 'gt')
+        condition |= Q(**dict(equal, **{lookup: value}))
+        equal[name] = value
+
+    return condition
+
+
+def iterate(queryset, ordering, chunk_size):
+    """
+    This function walk the whole queryset in chunks using keyset pagination, so only one chunk is held in memory
+    :param queryset: queryset to walk
+    :param ordering: sort keys as accepted by order_by, the last one must be unique
+    :param chunk_size: rows fetched per query
+    :return: generator of lists of rows
+    """
+    queryset = queryset.order_by(*ordering)
+    chunk = list(queryset[:chunk_size])
+
+    while chunk:
+        yield chunk
+
+        if len(chunk) < chunk_size:
+            return
+
+        last = chunk[-1]
+        values = [getattr(last, key.lstrip('-')) for key in ordering]
+        chunk = list(queryset.filter(after(ordering, values))[:chunk_size])
+
+
+def paginate(queryset, request, ordering, page_size=None):
+    """
+    This function return a page of the queryset using keyset pagination over the given sort keys, the last sort key
+    must be unique so that the order is stable
+    :param queryset: queryset to paginate
+    :param request: petition with optional cursor and page_size query params
+    :param ordering: sort keys as accepted by order_by, e.g. ('date', 'id')
+    :param page_size: rows per page, by default the one requested by the client
+    :return: (rows, next cursor or None)
+    """
+    if page_size is None:
+        page_size = get_page_size(request)
+
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        values = cursor_values(queryset.model, ordering, decode_cursor(cursor, len(ordering)))
+        queryset = queryset.filter(after(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+
+    return rows, encode_cursor([getattr(last, key.lstrip('-')) for key in ordering])
+
+
+def paginate_union(querysets, request, ordering):
+    """
+    This function return a page of the rows of several querysets merged in one order, using keyset pagination over
+    sort keys that every queryset has and that are unique across all of them. Each queryset reads at most one page.
+    :param querysets: list of querysets
+    :param request: petition with optional cursor and page_size query params
+    :param ordering: ascending sort keys as accepted by order_by, e.g. ('date', 'id')
+    :return: (rows, next cursor or None)
+    """
+    page_size = get_page_size(request)
+    rows = []
+    more = False
+
+    for queryset in querysets:
+        page, next_cursor = paginate(queryset, request, ordering, page_size)
+        rows.extend(page)
+        more = more or next_cursor is not None
+
+    rows.sort(key=lambda row: [getattr(row, key) for key in ordering])
+
+    if len(rows) <= page_size and not more:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+
+    return rows, encode_cursor([getattr(last, key) for key in ordering])
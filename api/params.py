@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+
+MAX_IDS = getattr(settings, 'API_MAX_IDS', 100)
+
+
+def get_ids(request):
+    """
+    This function return the ids requested through the ids query param, a comma separated list of at most API_MAX_IDS
+    ids, without repetitions and in the order they were sent
+    :param request: petition
+    :return: list of ids
+    :raise ValueError: the list is empty, too long or has an invalid id
+    """
+    ids = []
+    seen = set()
+    for value in request.query_params.get('ids', '').split(','):
+        pk = int(value)
+        if pk < 1:
+            raise ValueError('Invalid id %s' % value)
+        if pk not in seen:
+            if len(ids) == MAX_IDS:
+                raise ValueError('More than %d ids' % MAX_IDS)
+            seen.add(pk)
+            ids.append(pk)
+
+    return ids
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+COLUMNS_MEDIA_TYPE = 'application/vnd.denarius.columns+json'
+
+
+def _datetime(value):
+    # The same text as the JSON encoder of rest framework, Z for UTC
+    text = value.isoformat()
+    if text.endswith('+00:00'):
+        text = text[:-6] + 'Z'
+    return text
+
+
+# Exact type: conversion to the same JSON value that the encoder of rest framework writes, looked up once per column
+# instead of once per value
+CONVERTERS = {
+    Decimal: float,
+    date: date.isoformat,
+    datetime: _datetime,
+}
+
+_encoder = JSONEncoder()
+
+
+def _default(value):
+    converter = CONVERTERS.get(type(value))
+    return converter(value) if converter else _encoder.default(value)
+
+
+def _column(rows, key):
+    values = [row[key] for row in rows]
+    converter = CONVERTERS.get(type(next((value for value in values if value is not None), None)))
+    if converter is None:
+        return values
+    return [None if value is None else converter(value) for value in values]
+
+
+def to_columns(data):
+    """
+    This function replace every list of rows at the top level of a response with a header of column names and the
+    values of each row in the same order. The rows must have the same keys, like the ones built by a fieldset.
+    :param data: response data, e.g. {movements: [{id, amount, ...}], next}
+    :return: e.g. {movements: {columns: [id, amount, ...], rows: [[1, '10.00', ...]]}, next}
+    """
+    if not isinstance(data, dict):
+        return data
+
+    result = type(data)()
+    for key, value in data.items():
+        if isinstance(value, list) and value and isinstance(value[0], dict):
+            columns = list(value[0])
+            result[key] = {'columns': columns, 'rows': list(zip(*[_column(value, column) for column in columns]))}
+        else:
+            result[key] = value
+
+    return result
+
+
+class ColumnarRenderer(BaseRenderer):
+    """
+    Renderer of the compact columnar format, selected with Accept: application/vnd.denarius.columns+json or with
+    ?format=columns. The key names of a list are sent once and the decimals and dates are converted per column
+    before the json module writes the arrays, without going through the generic encoder of rest framework.
+    """
+
+    media_type = COLUMNS_MEDIA_TYPE
+    format = 'columns'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        text = json.dumps(to_columns(data), default=_default, ensure_ascii=False, separators=(',', ':'))
+        # Like JSONRenderer, keeps the output valid inside javascript
+        return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.pagination import iterate
+
+FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def _json_body(chunks, key, serialize):
+    yield '{%s:[' % _dumps(key)
+    first = True
+    for chunk in chunks:
+        body = ','.join(_dumps(serialize(row)) for row in chunk)
+        yield body if first else ',' + body
+        first = False
+    yield ']}'
+
+
+def _ndjson_body(chunks, serialize):
+    for chunk in chunks:
+        yield ''.join(_dumps(serialize(row)) + '\n' for row in chunk)
+
+
+def get_stream_format(request):
+    """
+    This function return the streaming format requested through the stream query param
+    :param request: petition
+    :return: 'json', 'ndjson' or None when the client did not ask for a stream
+    :raise ValueError: the format is not supported
+    """
+    stream_format = request.query_params.get('stream')
+
+    if stream_format and stream_format not in FORMATS:
+        raise ValueError('Unsupported stream format %s' % stream_format)
+
+    return stream_format or None
+
+
+def stream_response(queryset, ordering, key, serialize, stream_format):
+    """
+    This function return a response that writes the whole queryset incrementally, fetching it in chunks of
+    API_STREAM_CHUNK_SIZE rows with keyset pagination
+    :param queryset: queryset to export
+    :param ordering: sort keys as accepted by order_by, the last one must be unique
+    :param key: name of the list in the json format, e.g. 'movements'
+    :param serialize: function that turns a row into a dict
+    :param stream_format: 'json' for {key: [...]} or 'ndjson' for one object per line
+    :return: StreamingHttpResponse
+    """
+    chunks = iterate(queryset, ordering, getattr(settings, 'API_STREAM_CHUNK_SIZE', 2000))
+
+    if stream_format == 'ndjson':
+        body = _ndjson_body(chunks, serialize)
+    else:
+        body = _json_body(chunks, key, serialize)
+
+    return StreamingHttpResponse(body, content_type='%s; charset=utf-8' % FORMATS[stream_format])
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+
+
+def read_only(view):
+    """
+    This decorator take a view that only reads out of the transaction that ATOMIC_REQUESTS opens for every request:
+    its queries run in autocommit, without the round trips that open and commit the transaction and without holding
+    a snapshot while the response is serialized. With ATOMIC_READ_REQUESTS = True the view runs in a transaction
+    again, to compare both modes.
+    :param view: view function, it must not write
+    :return: view function
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(settings, 'ATOMIC_READ_REQUESTS', False):
+            with transaction.atomic():
+                return view(request, *args, **kwargs)
+        return view(request, *args, **kwargs)
+
+    # Must be the outermost decorator, the request handler looks for the mark on the view the url resolves to
+    return transaction.non_atomic_requests(wrapper)
@@ -3,7 +3,12 @@ from __future__ import unicode_literals
 
 from django.conf.urls import url, include
 
+from api.views import view_cache_stats, view_connection_stats
+
 urlpatterns = [
     url(r'^accounts/', include('accounts.api.urls')),
     url(r'^users/', include('users.api.urls')),
+
+    url(r'^cache_stats/$', view_cache_stats, name='api_view_cache_stats'),
+    url(r'^connection_stats/$', view_connection_stats, name='api_view_connection_stats'),
 ]
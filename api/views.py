@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connections
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from Denarius.middleware import connection_stats
+from accounts.cache import cache_stats
+from api.transactions import read_only
+
+
+@read_only
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def view_cache_stats(request):
+    """
+    This function return the hit and miss counters of the per user response cache of this worker, only for the staff
+    users, like the admin site
+    :param request: petition method GET
+    :return: {cache: {hits, misses}}
+    """
+    return Response({'cache': cache_stats()}, status=status.HTTP_200_OK)
+
+
+@read_only
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def view_connection_stats(request):
+    """
+    This function return the database connection counters of this worker, to size the worker pools, only for the
+    staff users, like the admin site
+    :param request: petition method GET
+    :return: {connections: {opened, reused, closed, dropped, average_setup_ms}, conn_max_age: {alias: seconds}}
+    """
+    return Response({
+        'connections': connection_stats(),
+        'conn_max_age': {
+            connection.alias: connection.settings_dict['CONN_MAX_AGE'] for connection in connections.all()
+        },
+    }, status=status.HTTP_200_OK)
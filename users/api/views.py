@@ -2,11 +2,16 @@
 from __future__ import unicode_literals
 
 from datetime import datetime
+from operator import methodcaller
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from api.fieldsets import attribute, Fieldset
+from api.pagination import paginate
+from api.streaming import get_stream_format, stream_response
+from api.transactions import read_only
 from users.models import User
 
 
@@ -59,7 +64,7 @@ def delete_user(request):
     """
     if request.method == 'POST':
         try:
-            user = User.objects.get(pk=request.data['user_id'])
+            user = User.all_objects.get(pk=request.data['user_id'])
 
             user.is_active = False
             user.delete_date = datetime.today()
@@ -87,7 +92,7 @@ def update_user(request):
     """
     if request.method == 'POST':
         try:
-            user = User.objects.get(pk=request.data['user_id'])
+            user = User.all_objects.get(pk=request.data['user_id'])
 
             name = request.data['name']
             birth_date = request.data['birth_date']
@@ -115,33 +120,51 @@ def update_user(request):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+USER_ADMIN_FIELDS = Fieldset(
+    attribute('id'),
+    attribute('last_login'),
+    attribute('nickname'),
+    ('full_name', ('full_name',), methodcaller('get_full_name')),
+    ('short_name', ('full_name',), methodcaller('get_short_name')),
+    attribute('email'),
+    ('gender', ('gender',), methodcaller('get_gender')),
+    attribute('birth_date'),
+    attribute('is_active'),
+    attribute('register_date'),
+    attribute('delete_date'),
+    ('role', ('role',), methodcaller('get_role')),
+)
+
+
+@read_only
 @api_view(['GET'])
 def view_users(request):
     """
-    This function return all users in the data base
+    This function return a page of all users in the data base newest first, or all of them as a stream
     :param request: petition method GET
+    :parameter cursor: next cursor of the previous page (optional)
+    :parameter page_size: users per page (optional)
+    :parameter stream: json or ndjson to stream every user instead of a page (optional)
+    :parameter fields: comma separated list of the keys to return (optional, all by default)
     :return: {users:[{id, last_login, nickname, full_name, short_name, email, gender, birth_date, is_active,
-             register_date, delete_date, role}]}
+             register_date, delete_date, role}], next}
     """
-    users = User.objects.all().order_by('-register_date')
-    response = []
-    for user in users:
-        response.append({
-            'id': user.pk,
-            'last_login': user.last_login,
-            'nickname': user.nickname,
-            'full_name': user.get_full_name(),
-            'short_name': user.get_short_name(),
-            'email': user.email,
-            'gender': user.get_gender(),
-            'birth_date': user.birth_date,
-            'is_active': user.is_active,
-            'register_date': user.register_date,
-            'delete_date': user.delete_date,
-            'role': user.get_role()
-        })
+    try:
+        keys = USER_ADMIN_FIELDS.get_keys(request)
+        users = USER_ADMIN_FIELDS.select(User.all_objects, keys, ('id', 'register_date'))
+        serialize = USER_ADMIN_FIELDS.serializer(keys)
+
+        stream_format = get_stream_format(request)
+        if stream_format:
+            return stream_response(users, ('-register_date', 'id'), 'users', serialize, stream_format)
+
+        users, next_cursor = paginate(users, request, ('-register_date', 'id'))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    response = [serialize(user) for user in users]
 
     if response:
-        return Response({'users': response}, status=status.HTTP_200_OK)
+        return Response({'users': response, 'next': next_cursor}, status=status.HTTP_200_OK)
     else:
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.10 on 2026-10-18 11:27
+from __future__ import unicode_literals
+
+import django.contrib.auth.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('nickname', models.CharField(max_length=30, unique=True, verbose_name='Nickname')),
+                ('full_name', models.CharField(max_length=80, verbose_name='Nombre completo')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='Correo electrónico')),
+                ('gender', models.IntegerField(choices=[(1, 'Femenino'), (2, 'Masculino')], default=2, verbose_name='Genero')),
+                ('birth_date', models.DateField(blank=True, null=True, verbose_name='Fecha de nacimiento')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Es activa')),
+                ('register_date', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de registro')),
+                ('delete_date', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de eliminación')),
+                ('role', models.IntegerField(blank=True, choices=[(1, 'Administrador'), (2, 'Usuario')], default=2, verbose_name='Rol')),
+                ('is_staff', models.BooleanField(default=False, verbose_name='staff status')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
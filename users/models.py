@@ -9,6 +9,7 @@ from django.db import models
 
 # Create your models here.
 from Denarius.Enums import Genres, Roles
+from Denarius.managers import ActiveUserManager
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -22,12 +23,18 @@ class User(AbstractBaseUser, PermissionsMixin):
     delete_date = models.DateTimeField(_('Fecha de eliminación'), blank=True, null=True)
     role = models.IntegerField(_('Rol'), choices=Roles.choices, default=Roles.User, blank=True)
     is_staff = models.BooleanField(_('staff status'), default=False)
+    data_version = models.PositiveIntegerField(_('Versión de datos'), default=0)
 
-    objects = UserManager()
+    # Only the active users; all_objects also has the soft deleted ones
+    objects = ActiveUserManager()
+    all_objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    class Meta:
+        default_manager_name = 'all_objects'
+
     def get_full_name(self):
         return self.full_name
 
@@ -1,6 +1,58 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from django.core.urlresolvers import reverse
 from django.test import TestCase
 
-# Create your tests here.
+from api.pagination import encode_cursor
+from users.models import User
+
+
+class ViewUsersTest(TestCase):
+
+    def test_pages_newest_first(self):
+        for index in range(7):
+            User.objects.create(nickname='user%d' % index, email='user%d@denarius.mx' % index)
+
+        ids, params = [], {'page_size': 3}
+        while True:
+            response = self.client.get(reverse('api_view_users'), params)
+            ids.extend(user['id'] for user in response.data['users'])
+            if response.data['next'] is None:
+                break
+            params['cursor'] = response.data['next']
+
+        expected = User.objects.order_by('-register_date', 'id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_invalid_cursor(self):
+        User.objects.create(nickname='ana', email='ana@denarius.mx')
+        for values in (['garbage', 1], [{}, 1]):
+            response = self.client.get(reverse('api_view_users'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400)
+
+    def test_deleted_users_are_listed(self):
+        user = User.objects.create(nickname='borrado', email='borrado@denarius.mx')
+        self.client.post(reverse('api_delete_user'), {'user_id': user.pk})
+
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertTrue(User.all_objects.filter(pk=user.pk).exists())
+        self.assertEqual([row['id'] for row in self.client.get(reverse('api_view_users')).data['users']], [user.pk])
+
+    def test_sparse_fields(self):
+        User.objects.create(nickname='ana', full_name='Ana Pérez', email='ana@denarius.mx')
+
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(reverse('api_view_users'), {'fields': 'short_name,id', 'page_size': 1})
+        self.assertEqual(response.data['users'], [{'id': response.data['users'][0]['id'], 'short_name': 'Ana'}])
+        self.assertNotIn('email', queries.captured_queries[0]['sql'])
+
+        self.assertEqual(self.client.get(reverse('api_view_users'), {'fields': 'password'}).status_code, 400)
+
+    def test_columnar_dates(self):
+        User.objects.create(nickname='ana', full_name='Ana Pérez', email='ana@denarius.mx')
+
+        rows = self.client.get(reverse('api_view_users'), HTTP_ACCEPT='application/json').json()['users']
+        columns = self.client.get(reverse('api_view_users'), {'format': 'columns'}).json()['users']
+
+        self.assertEqual([dict(zip(columns['columns'], row)) for row in columns['rows']], rows)